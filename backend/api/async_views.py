@@ -0,0 +1,53 @@
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+
+from .middleware import SAFE_METHODS
+from .signals import check_db_connections
+from .views import (IngredientViewSet, RecipeViewSet, TagViewSet,
+                    short_link_redirect)
+
+
+def async_read_view(view):
+    """Оборачивает синхронное представление для развертывания на ASGI.
+
+    Безопасные запросы выполняются в общем пуле потоков параллельно,
+    а не по очереди в единственном потоке, как Django выполняет
+    синхронные представления под ASGI. В Django 3.2 нет асинхронного
+    ORM, поэтому запросы к базе идут из потоков пула, у каждого свое
+    соединение. Запросы на запись проходят через потокобезопасный
+    адаптер, как и без обертки.
+    """
+    def read(request, *args, **kwargs):
+        check_db_connections(sender=None)
+        close_old_connections()
+        try:
+            response = view(request, *args, **kwargs)
+            if hasattr(response, 'render'):
+                response.render()
+            return response
+        finally:
+            close_old_connections()
+
+    read_async = sync_to_async(read, thread_sensitive=False)
+    write_async = sync_to_async(view, thread_sensitive=True)
+
+    async def wrapper(request, *args, **kwargs):
+        if request.method in SAFE_METHODS:
+            return await read_async(request, *args, **kwargs)
+        return await write_async(request, *args, **kwargs)
+
+    wrapper.csrf_exempt = getattr(view, 'csrf_exempt', False)
+    return wrapper
+
+
+recipe_list = async_read_view(
+    RecipeViewSet.as_view({'get': 'list', 'post': 'create'}))
+recipe_detail = async_read_view(RecipeViewSet.as_view({
+    'get': 'retrieve', 'patch': 'partial_update', 'delete': 'destroy'}))
+tag_list = async_read_view(TagViewSet.as_view({'get': 'list'}))
+tag_detail = async_read_view(TagViewSet.as_view({'get': 'retrieve'}))
+ingredient_list = async_read_view(
+    IngredientViewSet.as_view({'get': 'list'}))
+ingredient_detail = async_read_view(
+    IngredientViewSet.as_view({'get': 'retrieve'}))
+short_link = async_read_view(short_link_redirect)
@@ -0,0 +1,109 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+from .constants import (TOKEN_CACHE_EXCLUDED_FIELDS, TOKEN_CACHE_MAX_SIZE,
+                        TOKEN_CACHE_PREFIX, TOKEN_CACHE_TTL)
+from .metrics import cache_access
+
+User = get_user_model()
+# Хеш пароля в кеш не попадает и догружается из базы при обращении.
+USER_FIELDS = [field.attname for field in User._meta.concrete_fields
+               if field.attname not in TOKEN_CACHE_EXCLUDED_FIELDS]
+
+
+class TokenCache:
+    """Ограниченный по размеру и времени жизни кеш токенов.
+
+    По умолчанию записи живут в памяти процесса. При TOKEN_CACHE_SHARED
+    (включен, если задан MEMCACHED_LOCATION) используется общий кеш
+    Django, и инвалидация сразу видна всем воркерам.
+    """
+
+    def __init__(self, ttl=TOKEN_CACHE_TTL, max_size=TOKEN_CACHE_MAX_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    @property
+    def shared(self):
+        return getattr(settings, 'TOKEN_CACHE_SHARED', False)
+
+    def get(self, key):
+        if self.shared:
+            return cache.get(f'{TOKEN_CACHE_PREFIX}:{key}')
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                self.entries.move_to_end(key)
+                return entry[1]
+            self.entries.pop(key, None)
+        return None
+
+    def set(self, key, entry):
+        if self.shared:
+            cache.set(f'{TOKEN_CACHE_PREFIX}:{key}', entry, self.ttl)
+            return
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, entry)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def delete(self, *keys):
+        if self.shared:
+            cache.delete_many(
+                [f'{TOKEN_CACHE_PREFIX}:{key}' for key in keys])
+            return
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+token_cache = TokenCache()
+
+
+def invalidate_user_tokens(user_ids):
+    """Сбрасывает кеш всех токенов пользователей."""
+    keys = list(Token.objects.filter(
+        user_id__in=user_ids).values_list('key', flat=True))
+    if keys:
+        token_cache.delete(*keys)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Аутентификация по токену с кешированием пользователя.
+
+    В кеше хранятся id пользователя, флаг is_active и значения полей,
+    а каждый запрос получает собственный экземпляр пользователя,
+    поэтому изменения request.user не попадают в другие запросы.
+    Отозванный токен, смена пароля или деактивация пользователя
+    действуют сразу в текущем процессе (или во всех при общем кеше)
+    и не позже чем через TOKEN_CACHE_TTL секунд в остальных.
+    """
+
+    def authenticate_credentials(self, key):
+        entry = token_cache.get(key)
+        cache_access('token', entry is not None)
+        if entry is None:
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(key, (user.pk, user.is_active, tuple(
+                getattr(user, name) for name in USER_FIELDS)))
+            return user, token
+        user_id, is_active, values = entry
+        if not is_active:
+            raise AuthenticationFailed('User inactive or deleted.')
+        user = User.from_db('default', USER_FIELDS, values)
+        return user, Token(key=key, user=user)
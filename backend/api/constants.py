@@ -1 +1,47 @@
 PAGE_SIZE = 6
+TOKEN_CACHE_TTL = 60
+TOKEN_CACHE_MAX_SIZE = 10000
+TOKEN_CACHE_PREFIX = 'auth_token'
+TOKEN_CACHE_EXCLUDED_FIELDS = ('password',)
+GZIP_MIN_LENGTH = 1024
+REPLICA_DB_ALIAS = 'replica'
+REPLICA_STICKY_COOKIE = 'db_primary'
+REPLICA_STICKY_SECONDS = 5
+SHORT_LINK_PREFIX = 'r'
+SHORT_LINK_LENGTH = 7
+AVAILABLE_RECIPES_LIMIT = 1000
+FACETS_CACHE_KEY = 'recipe_tag_facets'
+FACETS_CACHE_TTL = 60
+FACETS_IGNORED_PARAMS = ('tags', 'ordering', 'page', 'limit', 'facets')
+FACETS_PARAM = 'facets'
+TRUE_VALUES = ('1', 'true')
+RESPONSE_CACHE_PREFIX = 'response'
+RESPONSE_CACHE_GENERATION_KEY = 'response_generation'
+RESPONSE_CACHE_LOCK_TIMEOUT = 5
+RESPONSE_CACHE_WAIT_INTERVAL = 0.05
+SKIP_FLAGS_PARAM = 'flags'
+N_PLUS_ONE_THRESHOLD = 5
+PROFILE_PARAM = 'profile'
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+PROFILE_INLINE = 'inline'
+PROFILE_SAVE = 'save'
+PROFILE_MODES = {
+    'inline': PROFILE_INLINE, '1': PROFILE_SAVE, 'true': PROFILE_SAVE,
+    'save': PROFILE_SAVE,
+}
+PROFILE_PREFIX = 'profile_rate'
+PROFILE_RATE_LIMIT = 10
+PROFILE_RATE_PERIOD = 3600
+PROFILE_TOP = 40
+PROFILE_MAX_REPORTS = 100
+DB_QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+DB_TIME_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+MAX_PAGE_SIZE = 100
+HEAVY_LIMIT = 24
+HEAVY_RECIPES_LIMIT = 10
+HEAVY_SCOPE = 'heavy'
+SUBSCRIPTIONS_ACTION = 'subscriptions'
+HEAVY_REQUESTS_LIMIT = 8
+HEAVY_SLOT_PREFIX = 'heavy_slot'
+HEAVY_SLOT_TIMEOUT = 60
+HEAVY_RETRY_AFTER = 1
@@ -0,0 +1,26 @@
+from contextvars import ContextVar
+
+from django.db import connections
+
+from .constants import REPLICA_DB_ALIAS
+
+replica_reads = ContextVar('replica_reads', default=False)
+
+
+class ReplicaRouter:
+    """Направляет чтение на реплику, если это разрешено для запроса.
+
+    Разрешение выставляет ReplicaRoutingMiddleware, поэтому команды
+    manage.py и фоновые задачи всегда работают с основной базой.
+    """
+
+    def db_for_read(self, model, **hints):
+        if replica_reads.get() and REPLICA_DB_ALIAS in connections:
+            return REPLICA_DB_ALIAS
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
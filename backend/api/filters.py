@@ -1,8 +1,12 @@
-from django_filters import (CharFilter, FilterSet,
+from django.contrib.auth import get_user_model
+from django.db.models import Exists, F, OuterRef, Q
+from django_filters import (CharFilter, ChoiceFilter, FilterSet,
                             ModelMultipleChoiceFilter, NumberFilter)
 
 from recipes.models import Ingredient, Recipe, Tag
 
+User = get_user_model()
+
 
 class IngredientFilter(FilterSet):
     """Фильтрация в ингредиентах."""
@@ -16,17 +20,36 @@ class IngredientFilter(FilterSet):
         return queryset.filter(name__istartswith=value)
 
 
+class UserFilter(FilterSet):
+    """Поиск пользователей по началу юзернейма, имени или фамилии."""
+    search = CharFilter(method='filter_search')
+
+    class Meta:
+        model = User
+        fields = ('search',)
+
+    def filter_search(self, queryset, name, value):
+        return queryset.filter(
+            Q(username__istartswith=value)
+            | Q(first_name__istartswith=value)
+            | Q(last_name__istartswith=value))
+
+
 class RecipeFilter(FilterSet):
     """Фильтрация в рецептах."""
     is_favorited = NumberFilter(method='filter_is_favorited')
     is_in_shopping_cart = NumberFilter(method='filter_is_in_shopping_cart')
     tags = ModelMultipleChoiceFilter(queryset=Tag.objects.all(),
-                                     field_name='tags__slug',
-                                     to_field_name='slug')
+                                     to_field_name='slug',
+                                     method='filter_tags')
+    ordering = ChoiceFilter(choices=(('popular', 'Популярные'),
+                                     ('trending', 'В тренде')),
+                            method='filter_ordering')
 
     class Meta:
         model = Recipe
-        fields = ('is_favorited', 'is_in_shopping_cart', 'author', 'tags')
+        fields = ('is_favorited', 'is_in_shopping_cart', 'author', 'tags',
+                  'ordering')
 
     def filter_is_favorited(self, queryset, name, value):
         user = self.request.user
@@ -39,3 +62,18 @@ class RecipeFilter(FilterSet):
         if user.is_authenticated:
             return queryset.filter(shoppinglists__user=user)
         return queryset
+
+    def filter_tags(self, queryset, name, value):
+        """Рецепты с любым из выбранных тегов.
+
+        Неизвестный слаг, как и раньше, дает ошибку 400. Полусоединение
+        EXISTS не размножает строки рецептов при выборе нескольких тегов.
+        """
+        if not value:
+            return queryset
+        return queryset.filter(Exists(Recipe.tags.through.objects.filter(
+            recipe_id=OuterRef('pk'), tag__in=value)))
+
+    def filter_ordering(self, queryset, name, value):
+        return queryset.order_by(
+            F(f'score__{value}').desc(nulls_last=True), '-id')
@@ -0,0 +1,89 @@
+import gzip
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from api.constants import PAGE_SIZE
+from api.renderers import ORJSONRenderer
+from api.serializers import RecipeSerializer
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag, User
+
+RENDERERS = (
+    ('json', JSONRenderer),
+    ('orjson', ORJSONRenderer),
+)
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ('Команда замеряет время рендеринга и размер ответа '
+            'для страницы рецептов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=PAGE_SIZE,
+                            help='Рецептов на странице')
+        parser.add_argument('--repeat', type=int, default=1000)
+        parser.add_argument('--fake', action='store_true',
+                            help='Сгенерировать временные рецепты')
+
+    def create_fake_recipes(self, limit):
+        author = User.objects.create(
+            email='benchmark@example.com', username='benchmark',
+            first_name='Бенчмарк', last_name='Бенчмарков')
+        tags = [Tag.objects.create(name=f'Тег {i}', slug=f'bench-{i}')
+                for i in range(3)]
+        ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {i}', measurement_unit='г')
+            for i in range(10)]
+        for i in range(limit):
+            recipe = Recipe.objects.create(
+                author=author, name=f'Рецепт {i}', cooking_time=30,
+                text='Очень подробное описание приготовления. ' * 40,
+                image='recipes/benchmark.png')
+            recipe.tags.set(tags)
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(recipe=recipe, ingredient=ingredient,
+                                 amount=100)
+                for ingredient in ingredients)
+
+    def measure(self, data, repeat):
+        for name, renderer_class in RENDERERS:
+            renderer = renderer_class()
+            start = time.perf_counter()
+            for _ in range(repeat):
+                content = renderer.render(data)
+            elapsed = (time.perf_counter() - start) / repeat * 1000
+            print(f'{name:>8}: {elapsed:8.3f} мс, '
+                  f'{len(content)} байт, '
+                  f'gzip {len(gzip.compress(content))} байт')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                if options['fake']:
+                    self.create_fake_recipes(options['limit'])
+                request = APIRequestFactory().get(
+                    '/api/recipes/', SERVER_NAME=settings.ALLOWED_HOSTS[0])
+                request.user = AnonymousUser()
+                recipes = Recipe.objects.all()[:options['limit']]
+                data = {
+                    'count': len(recipes),
+                    'next': None,
+                    'previous': None,
+                    'results': RecipeSerializer(
+                        recipes, many=True,
+                        context={'request': request}).data,
+                }
+                self.measure(data, options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
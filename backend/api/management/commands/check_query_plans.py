@@ -0,0 +1,202 @@
+import json
+import re
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import F, Sum
+from django.http import QueryDict
+from rest_framework.test import APIRequestFactory
+
+from api.constants import PAGE_SIZE
+from api.filters import IngredientFilter, RecipeFilter
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            RecipeScore, ShoppingList, Subscribe, Tag, User)
+
+LARGE_TABLES = (
+    'recipes_recipe', 'recipes_recipe_tags', 'recipes_recipeingredient',
+    'recipes_ingredient', 'recipes_favorite', 'recipes_shoppinglist',
+    'recipes_subscribe', 'recipes_user', 'recipes_recipescore',
+)
+RECIPE_FILTERS = (
+    {},
+    {'author': '{author}'},
+    {'tags': ['plan-0', 'plan-1']},
+    {'is_favorited': '1'},
+    {'is_in_shopping_cart': '1'},
+    {'author': '{author}', 'tags': ['plan-2'], 'is_favorited': '1'},
+)
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ('Команда заполняет базу временными данными и проверяет планы '
+            'основных запросов API: полные просмотры и сортировки больших '
+            'таблиц считаются ошибкой.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=5000)
+        parser.add_argument('--verbose-plans', action='store_true',
+                            help='Печатать планы всех запросов')
+
+    def seed(self, total):
+        users = [
+            User.objects.create(
+                email=f'plan{i}@example.com', username=f'plan{i}',
+                first_name='План', last_name=f'Планов{i}')
+            for i in range(max(total // 50, 2))]
+        tags = [Tag.objects.create(name=f'План {i}', slug=f'plan-{i}')
+                for i in range(8)]
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'план ингредиент {i}', measurement_unit='г')
+            for i in range(total // 5))
+        ingredient_ids = list(Ingredient.objects.filter(
+            name__startswith='план ').values_list('pk', flat=True))
+        Recipe.objects.bulk_create(
+            Recipe(author=users[i % len(users)], name=f'План {i}',
+                   text='План', cooking_time=10, image='recipes/plan.png')
+            for i in range(total))
+        recipe_ids = list(Recipe.objects.filter(
+            author__in=users).values_list('pk', flat=True))
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe_id=pk, tag=tags[(pk + shift) % 8])
+            for pk in recipe_ids for shift in (0, 3))
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe_id=pk, amount=1,
+                ingredient_id=ingredient_ids[(pk * 7 + shift)
+                                             % len(ingredient_ids)])
+            for pk in recipe_ids for shift in range(6))
+        RecipeScore.objects.bulk_create(
+            RecipeScore(recipe_id=pk, popular=pk % 97, trending=pk % 89)
+            for pk in recipe_ids)
+        for model in (Favorite, ShoppingList):
+            model.objects.bulk_create(
+                model(user=user, recipe_id=recipe_ids[(i * 31 + n) % total])
+                for i, user in enumerate(users) for n in range(20))
+        Subscribe.objects.bulk_create(
+            Subscribe(user=user, author=users[(i + n) % len(users)])
+            for i, user in enumerate(users) for n in range(1, 4))
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        return users[0]
+
+    def queries(self, user):
+        request = APIRequestFactory().get(
+            '/api/recipes/', SERVER_NAME=settings.ALLOWED_HOSTS[0])
+        request.user = user
+        for params in RECIPE_FILTERS:
+            data = QueryDict(mutable=True)
+            for name, value in params.items():
+                if isinstance(value, str):
+                    value = [value.format(author=user.pk)]
+                data.setlist(name, value)
+            recipes = RecipeFilter(
+                data, queryset=Recipe.objects.all(), request=request).qs
+            yield f'recipes {params}', recipes[:PAGE_SIZE]
+        yield 'download_shopping_cart', RecipeIngredient.objects.filter(
+            recipe__shoppinglists__user=user).values(
+            name=F('ingredient__name'),
+            measurement_unit=F('ingredient__measurement_unit')).annotate(
+            amount=Sum('amount'))
+        yield 'subscriptions', User.objects.filter(
+            following__user=user)[:PAGE_SIZE]
+        yield 'ingredients', IngredientFilter(
+            {'name': 'план ингредиент 1'},
+            queryset=Ingredient.objects.all()).qs
+
+    def explain(self, queryset):
+        if connection.vendor != 'postgresql':
+            return queryset.explain()
+        # Без последовательного просмотра PostgreSQL выбирает индекс
+        # везде, где он есть, и на небольших данных.
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain(format='json')
+
+    def postgresql_problems(self, node, sorted_input=False):
+        """Полные просмотры больших таблиц, сортировки над ними
+        и сортировки по выборке из индекса.
+        """
+        errors, warnings = [], []
+        table = node.get('Relation Name')
+        if table in LARGE_TABLES:
+            if node['Node Type'] == 'Seq Scan':
+                errors.append(f'Seq Scan on {table}')
+            elif sorted_input and not (node.get('Index Cond')
+                                       or node.get('Recheck Cond')):
+                errors.append(f'Sort over {node["Node Type"]} on {table}')
+            elif sorted_input:
+                warnings.append(f'Sort over {node["Node Type"]} on {table}')
+        sorted_input = sorted_input or node['Node Type'] == 'Sort'
+        for child in node.get('Plans', ()):
+            child_errors, child_warnings = self.postgresql_problems(
+                child, sorted_input)
+            errors += child_errors
+            warnings += child_warnings
+        return errors, warnings
+
+    def sqlite_problems(self, plan, queryset):
+        tables = '|'.join(LARGE_TABLES)
+        lines = [line.strip() for line in plan.splitlines()]
+        scans = [line for line in lines if re.search(
+            rf'\bSCAN (TABLE )?({tables})\b(?! USING COVERING)', line)]
+        sorts = [line for line in lines
+                 if re.search(r'USE TEMP B-TREE FOR (ORDER|GROUP) BY', line)]
+        if (queryset.query.high_mark is not None and scans
+                and scans[0] == lines[0]
+                and re.search(rf'SCAN (TABLE )?{queryset.model._meta.db_table}'
+                              r'$', lines[0])):
+            # Страница в порядке первичного ключа: SQLite читает
+            # таблицу по порядку и останавливается на LIMIT.
+            scans = scans[1:]
+        if scans:
+            return scans + sorts, []
+        return [], sorts
+
+    def problems(self, plan, queryset):
+        """Ошибки (полные просмотры и сортировки над ними) и
+        предупреждения (сортировки строк, найденных по индексу).
+        """
+        if connection.vendor == 'postgresql':
+            return self.postgresql_problems(json.loads(plan)[0]['Plan'])
+        return self.sqlite_problems(plan, queryset)
+
+    def check_plans(self, user, verbose):
+        failed = sorted_plans = 0
+        for name, queryset in self.queries(user):
+            plan = self.explain(queryset)
+            errors, warnings = self.problems(plan, queryset)
+            if errors:
+                failed += 1
+                print(f'ОШИБКА {name}:')
+            elif warnings:
+                sorted_plans += 1
+                print(f'СОРТИРОВКА {name}:')
+            else:
+                print(f'ok {name}')
+            for line in errors + warnings:
+                print(f'    {line}')
+            if verbose or errors or warnings:
+                print(plan)
+        return failed, sorted_plans
+
+    def handle(self, *args, **options):
+        failed = sorted_plans = 0
+        try:
+            with transaction.atomic():
+                user = self.seed(options['recipes'])
+                failed, sorted_plans = self.check_plans(
+                    user, options['verbose_plans'])
+                raise Rollback
+        except Rollback:
+            pass
+        if failed:
+            raise CommandError(f'Планов с полным просмотром '
+                               f'или сортировкой: {failed}')
+        print('Все планы используют индексы')
+        if sorted_plans:
+            print(f'Сортируют найденные по индексу строки: {sorted_plans}')
@@ -0,0 +1,65 @@
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+from django.core.management.base import BaseCommand
+
+
+def percentile(values, percent):
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+class Command(BaseCommand):
+    help = ('Команда нагружает запущенный сервер GET-запросами '
+            'и выводит пропускную способность и задержки.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='+')
+        parser.add_argument('--concurrency', type=int, default=10)
+        parser.add_argument('--duration', type=float, default=10)
+        parser.add_argument('--token', help='Токен авторизации')
+
+    def worker(self, urls, headers, deadline, results, lock):
+        index = 0
+        while time.monotonic() < deadline:
+            url = urls[index % len(urls)]
+            index += 1
+            start = time.perf_counter()
+            try:
+                with urlopen(Request(url, headers=headers)) as response:
+                    response.read()
+                    ok = response.status < 500
+            except HTTPError as error:
+                ok = error.code < 500
+            except URLError:
+                ok = False
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                results.append((ok, elapsed))
+
+    def handle(self, *args, **options):
+        headers = {}
+        if options['token']:
+            headers['Authorization'] = f'Token {options["token"]}'
+        results = []
+        lock = threading.Lock()
+        deadline = time.monotonic() + options['duration']
+        with ThreadPoolExecutor(options['concurrency']) as executor:
+            for _ in range(options['concurrency']):
+                executor.submit(self.worker, options['urls'], headers,
+                                deadline, results, lock)
+        latencies = [elapsed for _, elapsed in results]
+        errors = sum(1 for ok, _ in results if not ok)
+        print(f'Запросов: {len(results)}, ошибок: {errors}')
+        print(f'RPS: {len(results) / options["duration"]:.1f}')
+        if latencies:
+            print(f'Задержка, мс: среднее {statistics.mean(latencies):.1f}, '
+                  f'p50 {percentile(latencies, 50):.1f}, '
+                  f'p90 {percentile(latencies, 90):.1f}, '
+                  f'p99 {percentile(latencies, 99):.1f}')
@@ -0,0 +1,219 @@
+import json
+import re
+import statistics
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError, URLError
+from urllib.parse import quote
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from .load_test import percentile
+
+COLLECTION = (settings.BASE_DIR.parent / 'postman_collection'
+              / 'foodgram.postman_collection.json')
+VARIABLE = re.compile(r'{{(\w+)}}')
+EXPECTED_STATUS = re.compile(r'Статус-код ответа должен быть (\d{3})')
+LOCAL = re.compile(r'const (\w+) = _\.get\(responseData, "(\w+)"\)')
+SETTER = re.compile(r'collectionVariables\.set\(["\'](\w+)["\'],\s*(.+?)\);?$')
+ITEM = re.compile(r'responseData\[(\d+)\]\.(\w+)(\.slice\(0,\s*1\))?')
+IDENTITY = re.compile(r'email|username', re.IGNORECASE)
+
+
+def parse_setters(script):
+    """Разбирает, какие переменные тест запроса берет из ответа.
+
+    Поддерживаются выражения, которые встречаются в коллекции:
+    _.get(responseData, "поле") и responseData[i].поле.
+    """
+    local = dict(LOCAL.findall(script))
+    setters = []
+    for line in script.splitlines():
+        match = SETTER.search(line.strip())
+        if not match:
+            continue
+        name, expression = match.groups()
+        if expression in local:
+            setters.append((name, (local[expression],), False))
+            continue
+        item = ITEM.fullmatch(expression)
+        if item:
+            setters.append(
+                (name, (int(item[1]), item[2]), bool(item[3])))
+    return setters
+
+
+def auth_headers(auth):
+    if not auth or auth.get('type') != 'apikey':
+        return {}
+    values = {entry['key']: entry['value'] for entry in auth['apikey']}
+    return {values['key']: values['value']}
+
+
+def load_steps(items, auth=None):
+    """Разворачивает папки коллекции в список запросов по порядку."""
+    steps = []
+    for item in items:
+        item_auth = item.get('auth') or item.get('request', {}).get('auth')
+        if 'item' in item:
+            steps += load_steps(item['item'], item_auth or auth)
+            continue
+        request = item['request']
+        script = '\n'.join(
+            line for event in item.get('event', ())
+            if event['listen'] == 'test'
+            for line in event['script']['exec'])
+        expected = EXPECTED_STATUS.search(script)
+        headers = auth_headers(item_auth or auth)
+        headers.update({header['key']: header['value']
+                        for header in request.get('header', ())
+                        if not header.get('disabled')})
+        body = request.get('body', {}).get('raw')
+        if body is not None:
+            headers.setdefault('Content-Type', 'application/json')
+        url = request['url']
+        steps.append({
+            'name': item['name'],
+            'method': request['method'],
+            'url': url['raw'] if isinstance(url, dict) else url,
+            'headers': headers,
+            'body': body,
+            'setters': parse_setters(script),
+            'expected': int(expected[1]) if expected else None,
+        })
+    return steps
+
+
+def substitute(text, variables):
+    return VARIABLE.sub(
+        lambda match: str(variables.get(match[1], match[0])), text)
+
+
+class Command(BaseCommand):
+    help = ('Команда воспроизводит Postman-коллекцию проекта от имени '
+            'многих одновременных пользователей и выводит пропускную '
+            'способность, долю ошибок и задержки по каждому запросу. '
+            'Запускайте на тестовой базе: коллекция создает пользователей.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('collection', nargs='?', default=str(COLLECTION))
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--users', type=int, default=10,
+                            help='Число виртуальных пользователей')
+        parser.add_argument('--duration', type=float, default=60)
+        parser.add_argument('--iterations', type=int, default=0,
+                            help='Проходов коллекции на пользователя '
+                                 '(0 — до истечения --duration)')
+
+    def variables(self, base, tag):
+        """Переменные прохода с уникальными email и юзернеймами."""
+        variables = dict(base)
+        for name, value in base.items():
+            if (IDENTITY.search(name) and not name.startswith('tooLong')
+                    and value.startswith('"')):
+                variables[name] = f'"{tag}.{value[1:]}'
+        return variables
+
+    def send(self, step, variables):
+        url = quote(substitute(step['url'], variables), safe=':/?&=%+@')
+        body = step['body']
+        if body is not None:
+            body = substitute(body, variables).encode()
+        headers = {name: substitute(value, variables)
+                   for name, value in step['headers'].items()}
+        request = Request(url, data=body, headers=headers,
+                          method=step['method'])
+        try:
+            with urlopen(request) as response:
+                return response.status, response.read()
+        except HTTPError as error:
+            return error.code, error.read()
+
+    def extract(self, step, content, variables):
+        try:
+            data = json.loads(content)
+            for name, path, first_letter in step['setters']:
+                value = data
+                for key in path:
+                    value = value[key]
+                variables[name] = str(value)[:1] if first_letter else value
+        except (ValueError, LookupError, TypeError):
+            pass
+
+    def virtual_user(self, number, steps, base, options, deadline, results,
+                     lock):
+        run = uuid.uuid4().hex[:6]
+        iteration = 0
+        while time.monotonic() < deadline and (
+                not options['iterations']
+                or iteration < options['iterations']):
+            iteration += 1
+            variables = self.variables(base, f'lt{run}u{number}i{iteration}')
+            for step in steps:
+                if time.monotonic() >= deadline:
+                    return
+                start = time.perf_counter()
+                try:
+                    status, content = self.send(step, variables)
+                except URLError:
+                    status, content = None, b''
+                elapsed = (time.perf_counter() - start) * 1000
+                if status is None:
+                    ok = False
+                elif step['expected']:
+                    ok = status == step['expected']
+                else:
+                    ok = status < 500
+                if status is not None and status < 300:
+                    self.extract(step, content, variables)
+                with lock:
+                    results[step['name']].append((ok, elapsed))
+
+    def report(self, steps, results, elapsed):
+        print(f'{"Запрос":<60} {"всего":>6} {"RPS":>7} {"ошибок":>7} '
+              f'{"p50":>7} {"p90":>7} {"p99":>7}')
+        names = list(dict.fromkeys(step['name'] for step in steps))
+        total = []
+        for name in names:
+            rows = results.get(name)
+            if not rows:
+                continue
+            total += rows
+            latencies = [row[1] for row in rows]
+            errors = sum(1 for ok, _ in rows if not ok) / len(rows) * 100
+            print(f'{name[:60]:<60} {len(rows):>6} '
+                  f'{len(rows) / elapsed:>7.1f} {errors:>6.1f}% '
+                  f'{percentile(latencies, 50):>7.1f} '
+                  f'{percentile(latencies, 90):>7.1f} '
+                  f'{percentile(latencies, 99):>7.1f}')
+        if total:
+            latencies = [row[1] for row in total]
+            errors = sum(1 for ok, _ in total if not ok)
+            print(f'Запросов: {len(total)}, ошибок: {errors}, '
+                  f'RPS: {len(total) / elapsed:.1f}')
+            print(f'Задержка, мс: среднее {statistics.mean(latencies):.1f}, '
+                  f'p50 {percentile(latencies, 50):.1f}, '
+                  f'p90 {percentile(latencies, 90):.1f}, '
+                  f'p99 {percentile(latencies, 99):.1f}')
+
+    def handle(self, *args, **options):
+        with open(options['collection'], encoding='utf-8') as file:
+            collection = json.load(file)
+        base = {variable['key']: variable['value']
+                for variable in collection.get('variable', ())}
+        base['baseUrl'] = options['base_url'].rstrip('/')
+        steps = load_steps(collection['item'], collection.get('auth'))
+        results = defaultdict(list)
+        lock = threading.Lock()
+        start = time.monotonic()
+        deadline = start + options['duration']
+        with ThreadPoolExecutor(options['users']) as executor:
+            for number in range(options['users']):
+                executor.submit(self.virtual_user, number, steps, base,
+                                options, deadline, results, lock)
+        self.report(steps, results, time.monotonic() - start)
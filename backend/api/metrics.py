@@ -0,0 +1,148 @@
+import ipaddress
+import os
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connection, connections
+from django.http import HttpResponse, HttpResponseForbidden
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY,
+                               CollectorRegistry, Counter, Histogram,
+                               generate_latest, multiprocess)
+from prometheus_client.core import GaugeMetricFamily
+
+from recipes.models import Favorite, ShoppingList, Subscribe
+from .constants import DB_QUERY_BUCKETS, DB_TIME_BUCKETS
+
+REQUESTS = Counter(
+    'foodgram_requests_total', 'Запросы к API',
+    ('view', 'method', 'status'))
+LATENCY = Histogram(
+    'foodgram_request_duration_seconds', 'Время обработки запроса',
+    ('view',))
+DB_QUERIES = Histogram(
+    'foodgram_db_queries_per_request', 'Число SQL-запросов на запрос',
+    ('view',), buckets=DB_QUERY_BUCKETS)
+DB_TIME = Histogram(
+    'foodgram_db_duration_seconds_per_request',
+    'Время SQL-запросов на запрос', ('view',), buckets=DB_TIME_BUCKETS)
+CACHE = Counter(
+    'foodgram_cache_requests_total', 'Обращения к кешам',
+    ('cache', 'result'))
+
+TABLES = (
+    ('favorites', Favorite),
+    ('shopping_cart', ShoppingList),
+    ('subscriptions', Subscribe),
+)
+
+
+def cache_access(name, hit):
+    CACHE.labels(name, 'hit' if hit else 'miss').inc()
+
+
+def table_size(model):
+    """Размер таблицы; на PostgreSQL — оценка планировщика без count(*)."""
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE relname = %s',
+                [model._meta.db_table])
+            row = cursor.fetchone()
+        if row and row[0] >= 0:
+            return row[0]
+    return model.objects.count()
+
+
+class TableSizeCollector:
+    """Размеры таблиц избранного, покупок и подписок на момент сбора."""
+
+    def collect(self):
+        gauge = GaugeMetricFamily(
+            'foodgram_table_rows', 'Число строк в таблице', labels=('table',))
+        for name, model in TABLES:
+            gauge.add_metric((name,), table_size(model))
+        yield gauge
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - start
+
+
+def observe(get_response, request):
+    """Выполняет запрос и записывает его метрики.
+
+    SQL-запросы считаются по всем базам, включая реплику.
+    """
+    counter = QueryCounter()
+    start = time.perf_counter()
+    with ExitStack() as stack:
+        for alias_connection in connections.all():
+            stack.enter_context(alias_connection.execute_wrapper(counter))
+        response = get_response(request)
+    match = request.resolver_match
+    view = (match.view_name or match.route) if match else 'unresolved'
+    REQUESTS.labels(view, request.method, response.status_code).inc()
+    LATENCY.labels(view).observe(time.perf_counter() - start)
+    DB_QUERIES.labels(view).observe(counter.count)
+    DB_TIME.labels(view).observe(counter.duration)
+    return response
+
+
+def in_networks(address, networks):
+    """Входит ли адрес в одну из сетей или совпадает с адресом списка."""
+    try:
+        address = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(address in ipaddress.ip_network(network, strict=False)
+               for network in networks)
+
+
+def client_ip(request):
+    """Адрес клиента.
+
+    За nginx REMOTE_ADDR — адрес прокси, поэтому для запросов
+    с адресов METRICS_TRUSTED_PROXIES берется заголовок X-Real-IP,
+    который nginx выставляет сам. Остальным клиентам заголовок
+    не доверяется.
+    """
+    address = request.META.get('REMOTE_ADDR', '')
+    if in_networks(address, getattr(settings, 'METRICS_TRUSTED_PROXIES', ())):
+        return request.META.get('HTTP_X_REAL_IP', address)
+    return address
+
+
+def allowed(request):
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token and request.headers.get('Authorization') == f'Bearer {token}':
+        return True
+    return in_networks(client_ip(request), settings.METRICS_ALLOWED_IPS)
+
+
+def metrics_view(request):
+    """Метрики в формате Prometheus.
+
+    При запуске под gunicorn с PROMETHEUS_MULTIPROC_DIR значения
+    собираются из файлов всех воркеров.
+    """
+    if not allowed(request):
+        return HttpResponseForbidden()
+    registry = REGISTRY
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    tables = CollectorRegistry()
+    tables.register(TableSizeCollector())
+    return HttpResponse(generate_latest(registry) + generate_latest(tables),
+                        content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,195 @@
+import asyncio
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse
+from django.middleware.gzip import GZipMiddleware
+
+from .constants import (GZIP_MIN_LENGTH, HEAVY_REQUESTS_LIMIT,
+                        HEAVY_RETRY_AFTER, HEAVY_SLOT_PREFIX,
+                        HEAVY_SLOT_TIMEOUT, N_PLUS_ONE_THRESHOLD,
+                        PROFILE_INLINE, REPLICA_STICKY_COOKIE,
+                        REPLICA_STICKY_SECONDS)
+from .db_routers import replica_reads
+from .metrics import observe
+from .profiling import (allow_profile, profile, profile_lock, profile_mode,
+                        staff_user, store_report)
+from .throttles import is_heavy
+from .query_tracking import track_queries
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """Сжимает ответы длиннее GZIP_MIN_LENGTH байт."""
+
+    def process_response(self, request, response):
+        min_length = getattr(settings, 'GZIP_MIN_LENGTH', GZIP_MIN_LENGTH)
+        if not response.streaming and len(response.content) < min_length:
+            return response
+        return super().process_response(request, response)
+
+
+class ReplicaRoutingMiddleware:
+    """Разрешает чтение с реплики для безопасных запросов.
+
+    После записи клиент получает cookie, и в течение
+    REPLICA_STICKY_SECONDS его запросы читают основную базу,
+    чтобы видеть собственные изменения несмотря на задержку репликации.
+    Работает и в асинхронной цепочке, чтобы не переводить запросы
+    режима ASGI обратно в синхронный поток.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Так же помечает себя MiddlewareMixin в Django 3.2.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        token = self.process_request(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            replica_reads.reset(token)
+        return self.process_response(request, response)
+
+    async def __acall__(self, request):
+        token = self.process_request(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            replica_reads.reset(token)
+        return self.process_response(request, response)
+
+    def process_request(self, request):
+        return replica_reads.set(
+            request.method in SAFE_METHODS
+            and REPLICA_STICKY_COOKIE not in request.COOKIES)
+
+    def process_response(self, request, response):
+        if request.method not in SAFE_METHODS:
+            response.set_cookie(
+                REPLICA_STICKY_COOKIE, '1',
+                max_age=getattr(settings, 'REPLICA_STICKY_SECONDS',
+                                REPLICA_STICKY_SECONDS),
+                httponly=True, samesite='Lax')
+        return response
+
+
+class QueryTrackingMiddleware:
+    """Ищет N+1 запросы в каждом запросе к API.
+
+    Включается настройкой N_PLUS_ONE_DETECTION: log пишет
+    предупреждения, raise завершает запрос ошибкой.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with track_queries(
+                getattr(settings, 'N_PLUS_ONE_THRESHOLD',
+                        N_PLUS_ONE_THRESHOLD),
+                strict=settings.N_PLUS_ONE_DETECTION == 'raise',
+                label=f'{request.method} {request.path}'):
+            return self.get_response(request)
+
+
+class ProfilingMiddleware:
+    """Профилирует запрос по флагу profile от сотрудника.
+
+    Флаг передается параметром ?profile= или заголовком X-Profile:
+    inline возвращает отчет вместо ответа, 1, true и save сохраняют
+    его в PROFILING_DIR и называют файл в заголовке X-Profile-Report,
+    остальные значения профилирование не включают. Число профилей
+    ограничено, и в процессе одновременно выполняется только один.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = profile_mode(request)
+        if mode is None:
+            return self.get_response(request)
+        user = staff_user(request)
+        if (user is None or not allow_profile(user)
+                or not profile_lock.acquire(blocking=False)):
+            return self.get_response(request)
+        try:
+            response, report = profile(self.get_response, request)
+        finally:
+            profile_lock.release()
+        if mode == PROFILE_INLINE:
+            return HttpResponse(report, content_type='text/plain')
+        response['X-Profile-Report'] = store_report(report)
+        return response
+
+
+class MetricsMiddleware:
+    """Считает запросы, задержки и SQL-запросы для /metrics."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return observe(self.get_response, request)
+
+
+class ConcurrencyLimitMiddleware:
+    """Ограничивает число дорогих запросов, выполняемых одновременно.
+
+    Слоты — ключи heavy_slot:N в кеше, занимаются атомарным add,
+    поэтому с общим кешем (MEMCACHED_LOCATION) лимит HEAVY_REQUESTS_LIMIT
+    общий для всех воркеров. Если свободных слотов нет, запрос сразу
+    получает 503 с Retry-After. Слот упавшего воркера освобождается
+    через HEAVY_SLOT_TIMEOUT секунд; в слоте хранится токен запроса,
+    и запрос освобождает только свой слот.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.limit = getattr(
+            settings, 'HEAVY_REQUESTS_LIMIT', HEAVY_REQUESTS_LIMIT)
+        self.timeout = getattr(
+            settings, 'HEAVY_SLOT_TIMEOUT', HEAVY_SLOT_TIMEOUT)
+
+    def __call__(self, request):
+        try:
+            return self.get_response(request)
+        finally:
+            slot = getattr(request, 'heavy_slot', None)
+            if slot:
+                self.release(*slot)
+
+    @staticmethod
+    def release(slot, token):
+        # Слот, истекший за время запроса, мог занять другой запрос:
+        # удаляется только слот со своим токеном.
+        if cache.get(slot) == token:
+            cache.delete(slot)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        initkwargs = getattr(view_func, 'initkwargs', {})
+        scope = initkwargs.get('throttle_scope', getattr(
+            getattr(view_func, 'cls', None), 'throttle_scope', None))
+        actions = getattr(view_func, 'actions', None) or {}
+        if not is_heavy(request, scope, actions.get(request.method.lower())):
+            return None
+        token = uuid.uuid4().hex
+        for number in range(self.limit):
+            slot = f'{HEAVY_SLOT_PREFIX}:{number}'
+            if cache.add(slot, token, self.timeout):
+                request.heavy_slot = (slot, token)
+                return None
+        response = JsonResponse(
+            {'detail': 'Сервер перегружен, повторите запрос позже'},
+            status=503)
+        response['Retry-After'] = HEAVY_RETRY_AFTER
+        return response
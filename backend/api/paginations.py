@@ -1,9 +1,10 @@
 from rest_framework.pagination import PageNumberPagination
 
-from .constants import PAGE_SIZE
+from .constants import MAX_PAGE_SIZE, PAGE_SIZE
 
 
 class CustomPagination(PageNumberPagination):
     """Пагинация."""
     page_size = PAGE_SIZE
     page_size_query_param = 'limit'
+    max_page_size = MAX_PAGE_SIZE
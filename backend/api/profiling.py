@@ -0,0 +1,99 @@
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+
+from .authentication import CachedTokenAuthentication
+from .constants import (PROFILE_HEADER, PROFILE_MAX_REPORTS, PROFILE_MODES,
+                        PROFILE_PARAM, PROFILE_PREFIX, PROFILE_RATE_LIMIT,
+                        PROFILE_RATE_PERIOD, PROFILE_TOP)
+
+profile_lock = threading.Lock()
+
+
+def profile_mode(request):
+    """Режим профилирования из ?profile= или X-Profile.
+
+    Учитываются только значения из PROFILE_MODES; 0, false, пустое
+    и любое другое значение профилирование не включают.
+    """
+    value = request.GET.get(PROFILE_PARAM)
+    if value is None:
+        value = request.META.get(PROFILE_HEADER, '')
+    return PROFILE_MODES.get(value.strip().lower())
+
+
+def staff_user(request):
+    """Пользователь запроса по токену, если он сотрудник."""
+    try:
+        result = CachedTokenAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return None
+    if result is None or not result[0].is_staff:
+        return None
+    return result[0]
+
+
+def allow_profile(user):
+    """Ограничивает число профилей на сотрудника за период."""
+    key = f'{PROFILE_PREFIX}:{user.pk}'
+    cache.add(key, 0, PROFILE_RATE_PERIOD)
+    try:
+        return cache.incr(key) <= PROFILE_RATE_LIMIT
+    except ValueError:
+        return False
+
+
+def profile(get_response, request):
+    """Выполняет запрос под cProfile и tracemalloc.
+
+    Возвращает ответ и текст отчета: самые затратные функции
+    по накопленному времени и строки с наибольшим выделением памяти.
+    """
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    profiler = cProfile.Profile()
+    start = time.perf_counter()
+    profiler.enable()
+    try:
+        response = get_response(request)
+    finally:
+        profiler.disable()
+        elapsed = (time.perf_counter() - start) * 1000
+        after = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        if started_tracing:
+            tracemalloc.stop()
+    report = io.StringIO()
+    report.write(f'{request.method} {request.get_full_path()} '
+                 f'-> {response.status_code}, {elapsed:.1f} мс\n'
+                 f'Память: пик {peak / 1024:.1f} КиБ\n\n')
+    pstats.Stats(profiler, stream=report).sort_stats(
+        'cumulative').print_stats(PROFILE_TOP)
+    report.write('Выделение памяти по строкам:\n')
+    for stat in after.compare_to(before, 'lineno')[:PROFILE_TOP]:
+        report.write(f'{stat}\n')
+    return response, report.getvalue()
+
+
+def store_report(report):
+    """Сохраняет отчет в PROFILING_DIR, удаляя самые старые."""
+    directory = settings.PROFILING_DIR
+    os.makedirs(directory, exist_ok=True)
+    name = f'{timezone.now():%Y%m%d-%H%M%S-%f}.txt'
+    with open(os.path.join(directory, name), 'w', encoding='utf-8') as file:
+        file.write(report)
+    reports = sorted(os.listdir(directory))
+    for old in reports[:-PROFILE_MAX_REPORTS]:
+        os.remove(os.path.join(directory, old))
+    return name
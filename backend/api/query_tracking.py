@@ -0,0 +1,93 @@
+import logging
+import re
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.db import connections
+from rest_framework.serializers import Serializer
+
+from .constants import N_PLUS_ONE_THRESHOLD
+
+logger = logging.getLogger(__name__)
+
+current_field = ContextVar('current_field', default=None)
+
+IN_LIST = re.compile(r'IN \((%s(, )?)+\)')
+
+
+class NPlusOneError(Exception):
+    pass
+
+
+def query_shape(sql):
+    """Текст запроса без учета длины списков IN (...)."""
+    return IN_LIST.sub('IN (...)', sql)
+
+
+class QueryTracker:
+    """Считает одинаковые запросы в пределах запроса к API.
+
+    Запросы группируются по полю сериализатора, которое их вызвало.
+    Когда запрос повторяется больше threshold раз, пишется
+    предупреждение или, при strict=True, выбрасывается NPlusOneError.
+    """
+
+    def __init__(self, threshold=N_PLUS_ONE_THRESHOLD, strict=False,
+                 label=''):
+        self.threshold = threshold
+        self.strict = strict
+        self.label = label
+        self.counts = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        field = current_field.get()
+        key = (field, query_shape(sql))
+        self.counts[key] += 1
+        if self.counts[key] == self.threshold + 1:
+            message = (f'N+1 {self.label}: запрос повторился больше '
+                       f'{self.threshold} раз в поле '
+                       f'{field or "вне сериализатора"}: {key[1]}')
+            if self.strict:
+                raise NPlusOneError(message)
+            logger.warning(message)
+        return execute(sql, params, many, context)
+
+
+@contextmanager
+def track_queries(threshold=N_PLUS_ONE_THRESHOLD, strict=False, label=''):
+    """Отслеживает повторяющиеся запросы ко всем базам, включая
+    реплику, например в тестах.
+    """
+    install_serializer_tracking()
+    tracker = QueryTracker(threshold, strict, label)
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(tracker))
+        yield tracker
+
+
+def install_serializer_tracking():
+    """Запоминает поле сериализатора, которое сейчас сериализуется.
+
+    Serializer.to_representation полностью обрабатывает каждое поле
+    из _readable_fields, прежде чем взять следующее, поэтому поле
+    можно отметить на время его обработки. Свойство подменяется
+    при первом отслеживании, поэтому процессы, которые не ищут N+1,
+    работают с исходным DRF.
+    """
+    readable_fields = Serializer._readable_fields.fget
+    if getattr(readable_fields, 'tracked', False):
+        return
+
+    def tracked_readable_fields(self):
+        for field in readable_fields(self):
+            token = current_field.set(
+                f'{type(self).__name__}.{field.field_name}')
+            try:
+                yield field
+            finally:
+                current_field.reset(token)
+
+    tracked_readable_fields.tracked = True
+    Serializer._readable_fields = property(tracked_readable_fields)
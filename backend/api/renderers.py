@@ -0,0 +1,17 @@
+import orjson
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class ORJSONRenderer(JSONRenderer):
+    """Рендерер JSON на orjson, совместимый по выводу с JSONRenderer."""
+    encoder = JSONEncoder()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        option = orjson.OPT_INDENT_2 if indent else 0
+        return orjson.dumps(
+            data, default=self.encoder.default,
+            option=option | orjson.OPT_NON_STR_KEYS)
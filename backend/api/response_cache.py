@@ -0,0 +1,93 @@
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from rest_framework.exceptions import NotAcceptable
+
+from .constants import (RESPONSE_CACHE_GENERATION_KEY,
+                        RESPONSE_CACHE_LOCK_TIMEOUT, RESPONSE_CACHE_PREFIX,
+                        RESPONSE_CACHE_WAIT_INTERVAL)
+from .metrics import cache_access
+
+
+def generation():
+    return cache.get(RESPONSE_CACHE_GENERATION_KEY, 0)
+
+
+def bump_generation():
+    """Делает недействительными все закешированные ответы."""
+    try:
+        cache.incr(RESPONSE_CACHE_GENERATION_KEY)
+    except ValueError:
+        cache.set(RESPONSE_CACHE_GENERATION_KEY, 1, None)
+
+
+def response_key(request, media_type):
+    """Ключ ответа по хосту, пути, параметрам запроса и формату ответа."""
+    query = urlencode(sorted(
+        (name, value)
+        for name, values in request.GET.lists()
+        for value in values))
+    digest = hashlib.sha1(
+        f'{request.get_host()}{request.path}?{query}:{media_type}'.encode()
+    ).hexdigest()
+    return f'{RESPONSE_CACHE_PREFIX}:{generation()}:{digest}'
+
+
+class AnonymousCacheMixin:
+    """Кеширует ответы list и retrieve для анонимных пользователей.
+
+    Ответ для гостя не зависит от пользователя, поэтому кешируется
+    целиком вместе с заголовками, отдельно для каждого формата,
+    выбранного по заголовку Accept. При промахе ответ собирает только
+    один запрос, остальные ждут его результата в кеше. Изменения данных
+    сбрасывают кеш сразу во всех воркерах, если кеш Django общий
+    (MEMCACHED_LOCATION); иначе другие воркеры отдают прежние ответы
+    не дольше RESPONSE_CACHE_TTL секунд.
+    """
+
+    cached_actions = ('list', 'retrieve')
+
+    def dispatch(self, request, *args, **kwargs):
+        ttl = getattr(settings, 'RESPONSE_CACHE_TTL', 0)
+        if (not ttl or request.method != 'GET'
+                or self.action_map.get('get') not in self.cached_actions
+                or 'HTTP_AUTHORIZATION' in request.META
+                or 'text/html' in request.META.get('HTTP_ACCEPT', '')):
+            return super().dispatch(request, *args, **kwargs)
+        self.format_kwarg = self.get_format_suffix(**kwargs)
+        try:
+            renderer, media_type = self.perform_content_negotiation(
+                self.initialize_request(request, *args, **kwargs))
+        except NotAcceptable:
+            return super().dispatch(request, *args, **kwargs)
+        key = response_key(request, f'{renderer.format}:{media_type}')
+        lock = f'{key}:lock'
+        cached = cache.get(key)
+        cache_access('response', cached is not None)
+        locked = cached is None and cache.add(
+            lock, 1, RESPONSE_CACHE_LOCK_TIMEOUT)
+        if cached is None and not locked:
+            deadline = time.monotonic() + RESPONSE_CACHE_LOCK_TIMEOUT
+            while cached is None and time.monotonic() < deadline:
+                time.sleep(RESPONSE_CACHE_WAIT_INTERVAL)
+                cached = cache.get(key)
+        if cached is not None:
+            content, headers = cached
+            response = HttpResponse(content)
+            for header, value in headers:
+                response[header] = value
+            return response
+        try:
+            response = super().dispatch(request, *args, **kwargs)
+            if response.status_code == 200 and not response.cookies:
+                response.render()
+                cache.set(key, (response.content, list(response.items())),
+                          ttl)
+            return response
+        finally:
+            if locked:
+                cache.delete(lock)
@@ -7,12 +7,32 @@ from rest_framework.validators import UniqueTogetherValidator
 from recipes.constants import MIN_VALUE_AMOUNT
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
                             ShoppingList, Subscribe, Tag)
+from .constants import SKIP_FLAGS_PARAM
 
 User = get_user_model()
 
 
-class UserGetSerializer(UserSerializer):
+class SkipFlagsMixin:
+    """Убирает из ответа флаги текущего пользователя по запросу клиента.
+
+    Клиент, который хранит снимок /api/users/me/state/, передает
+    flags=0, и флаги не вычисляются для каждой записи.
+    """
+    flag_fields = ()
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        if (request is not None
+                and request.query_params.get(SKIP_FLAGS_PARAM) == '0'):
+            for name in self.flag_fields:
+                fields.pop(name, None)
+        return fields
+
+
+class UserGetSerializer(SkipFlagsMixin, UserSerializer):
     """Сериализатор пользователей."""
+    flag_fields = ('is_subscribed',)
     is_subscribed = serializers.SerializerMethodField()
 
     class Meta(UserSerializer.Meta):
@@ -21,6 +41,8 @@ class UserGetSerializer(UserSerializer):
                   'is_subscribed', 'avatar')
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         request = self.context.get('request')
         return (request.user.is_authenticated
                 and request.user.follower.filter(author=obj).exists())
@@ -63,8 +85,9 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
         read_only_fields = ('name', 'measurement_unit')
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(SkipFlagsMixin, serializers.ModelSerializer):
     """Сериализатор получения рецептов."""
+    flag_fields = ('is_favorited', 'is_in_shopping_cart')
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
     image = Base64ImageField()
@@ -92,6 +115,22 @@ class RecipeSerializer(serializers.ModelSerializer):
                 and user.shoppinglists.filter(recipe=obj).exists())
 
 
+class AvailableRecipeSerializer(RecipeSerializer):
+    """Сериализатор рецептов, подобранных по имеющимся ингредиентам."""
+    missing_ingredients = serializers.IntegerField(read_only=True)
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + ('missing_ingredients',)
+
+
+class AvailableRecipesQuerySerializer(serializers.Serializer):
+    """Параметры подбора рецептов по имеющимся ингредиентам."""
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), min_length=1)
+    tags = serializers.ListField(
+        child=serializers.SlugField(), required=False)
+
+
 class IngredientPostSerializer(serializers.ModelSerializer):
     """Сериализатор добавления ингредиентов в рецепт."""
     id = serializers.PrimaryKeyRelatedField(
@@ -172,6 +211,30 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
         return RecipeSerializer(instance, context=self.context).data
 
 
+class UserStateSerializer(serializers.ModelSerializer):
+    """Сериализатор снимка избранного, покупок и подписок."""
+    version = serializers.IntegerField(source='state_version')
+    favorites = serializers.SerializerMethodField()
+    shopping_cart = serializers.SerializerMethodField()
+    subscriptions = serializers.SerializerMethodField()
+
+    class Meta:
+        model = User
+        fields = ('version', 'favorites', 'shopping_cart', 'subscriptions')
+
+    def get_favorites(self, obj):
+        return list(Favorite.objects.filter(user=obj).order_by(
+            'recipe_id').values_list('recipe_id', flat=True))
+
+    def get_shopping_cart(self, obj):
+        return list(ShoppingList.objects.filter(user=obj).order_by(
+            'recipe_id').values_list('recipe_id', flat=True))
+
+    def get_subscriptions(self, obj):
+        return list(Subscribe.objects.filter(user=obj).order_by(
+            'author_id').values_list('author_id', flat=True))
+
+
 class CutRecipeSerializer(serializers.ModelSerializer):
     """Краткий сериализатор рецепта."""
 
@@ -0,0 +1,54 @@
+import hashlib
+import random
+import string
+
+from django.conf import settings
+
+from .constants import SHORT_LINK_LENGTH, SHORT_LINK_PREFIX
+
+BASE = 62
+MODULUS = BASE ** SHORT_LINK_LENGTH
+
+
+def _key():
+    salt = getattr(settings, 'SHORT_LINK_SALT', '')
+    digest = int(hashlib.sha256(salt.encode()).hexdigest(), 16)
+    alphabet = list(string.digits + string.ascii_letters)
+    random.Random(digest).shuffle(alphabet)
+    multiplier = digest % MODULUS | 1
+    while multiplier % 31 == 0:
+        multiplier += 2
+    offset = (digest >> 64) % MODULUS
+    return ''.join(alphabet), multiplier, offset
+
+
+ALPHABET, MULTIPLIER, OFFSET = _key()
+INVERSE = pow(MULTIPLIER, -1, MODULUS)
+
+
+def encode(recipe_id):
+    """Возвращает короткий код рецепта без обращения к базе.
+
+    Префикс отличает такие коды от выданных ранее через urlshortner:
+    те состоят из шестнадцатеричных символов.
+    """
+    number = (recipe_id * MULTIPLIER + OFFSET) % MODULUS
+    chars = []
+    for _ in range(SHORT_LINK_LENGTH):
+        number, index = divmod(number, BASE)
+        chars.append(ALPHABET[index])
+    return SHORT_LINK_PREFIX + ''.join(reversed(chars))
+
+
+def decode(code):
+    """Возвращает id рецепта по коду или None для чужого кода."""
+    if (not code.startswith(SHORT_LINK_PREFIX)
+            or len(code) != len(SHORT_LINK_PREFIX) + SHORT_LINK_LENGTH):
+        return None
+    number = 0
+    for char in code[len(SHORT_LINK_PREFIX):]:
+        index = ALPHABET.find(char)
+        if index < 0:
+            return None
+        number = number * BASE + index
+    return (number - OFFSET) * INVERSE % MODULUS
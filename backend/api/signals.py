@@ -0,0 +1,116 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.signals import request_started
+from django.db import connections
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from recipes.ingredient_index import ingredient_index
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingList, Subscribe, Tag)
+from recipes.purge import recipes_purged, users_deactivated
+from recipes.transfer import recipes_imported
+from .authentication import invalidate_user_tokens, token_cache
+from .constants import FACETS_CACHE_KEY
+from .response_cache import bump_generation
+
+User = get_user_model()
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    """Сбрасывает кеш токена при выходе пользователя."""
+    token_cache.delete(instance.key)
+
+
+@receiver(post_save, sender=User)
+def reset_user_tokens(sender, instance, **kwargs):
+    """Сбрасывает кеш токенов при смене пароля или деактивации."""
+    invalidate_user_tokens([instance.pk])
+
+
+@receiver(users_deactivated)
+def reset_deactivated_user_tokens(sender, user_ids, **kwargs):
+    """Сбрасывает кеш токенов пользователей, деактивированных update()."""
+    invalidate_user_tokens(user_ids)
+
+
+@receiver(request_started)
+def check_db_connections(sender, **kwargs):
+    """Закрывает оборвавшиеся постоянные соединения до начала запроса.
+
+    Иначе после перезапуска базы первый запрос каждого воркера
+    на старом соединении завершился бы ошибкой.
+    """
+    if not settings.CONN_HEALTH_CHECKS:
+        return
+    for connection in connections.all():
+        if connection.connection is not None and not connection.is_usable():
+            connection.close()
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def reindex_recipe(sender, instance, **kwargs):
+    """Обновляет индекс ингредиентов после изменения рецепта."""
+    ingredient_index.schedule_update(instance.pk)
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def reindex_recipe_ingredients(sender, instance, **kwargs):
+    """Обновляет индекс при правке ингредиентов из админки."""
+    ingredient_index.schedule_update(instance.recipe_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def reindex_recipe_tags(sender, instance, action, **kwargs):
+    """Обновляет теги рецепта в индексе ингредиентов."""
+    if action.startswith('post_') and isinstance(instance, Recipe):
+        ingredient_index.schedule_update(instance.pk)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(recipes_imported)
+@receiver(recipes_purged)
+def reset_tag_facets(sender, **kwargs):
+    """Сбрасывает закешированные счетчики рецептов по тегам."""
+    cache.delete(FACETS_CACHE_KEY)
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_save, sender=ShoppingList)
+@receiver(post_delete, sender=ShoppingList)
+@receiver(post_save, sender=Subscribe)
+@receiver(post_delete, sender=Subscribe)
+def bump_user_state(sender, instance, **kwargs):
+    """Меняет версию снимка состояния пользователя."""
+    User.objects.filter(pk=instance.user_id).update(
+        state_version=F('state_version') + 1)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+@receiver(recipes_imported)
+@receiver(recipes_purged)
+@receiver(users_deactivated)
+def reset_response_cache(sender, update_fields=None, **kwargs):
+    """Сбрасывает кеш ответов для гостей при изменении данных."""
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    bump_generation()
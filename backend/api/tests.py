@@ -0,0 +1,469 @@
+import asyncio
+import importlib
+import io
+from contextlib import redirect_stdout
+from types import SimpleNamespace
+from unittest import mock
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import clear_url_caches, resolve, reverse
+from rest_framework import generics, serializers
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from foodgram_backend import urls as project_urls
+from foodgram_backend.warmup import warm_up
+from recipes.ingredient_index import ingredient_index
+from recipes.models import Recipe, Tag
+from . import async_views, urls as api_urls
+from .authentication import (CachedTokenAuthentication, TokenCache,
+                             token_cache)
+from .constants import HEAVY_SCOPE, N_PLUS_ONE_THRESHOLD
+from .filters import RecipeFilter
+from .management.commands.check_query_plans import (
+    Command as CheckQueryPlansCommand)
+from .metrics import allowed
+from .middleware import ConcurrencyLimitMiddleware
+from .profiling import profile_mode
+from .query_tracking import track_queries
+from .signals import check_db_connections
+from .throttles import HeavyRateThrottle
+
+User = get_user_model()
+
+
+class CachedTokenAuthenticationTests(TestCase):
+
+    def setUp(self):
+        token_cache.clear()
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='cook', email='cook@foodgram.ru', password='secret')
+        self.token = Token.objects.create(user=self.user)
+        self.auth = CachedTokenAuthentication()
+
+    def authenticate(self):
+        return self.auth.authenticate_credentials(self.token.key)
+
+    def test_miss_then_hit(self):
+        with self.assertNumQueries(1):
+            user, _ = self.authenticate()
+        self.assertEqual(user, self.user)
+        with self.assertNumQueries(0):
+            user, token = self.authenticate()
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertEqual(user.email, self.user.email)
+        self.assertEqual(token.key, self.token.key)
+
+    def test_hit_returns_separate_user_instances(self):
+        self.authenticate()
+        first, _ = self.authenticate()
+        first.first_name = 'changed'
+        second, _ = self.authenticate()
+        self.assertIsNot(first, second)
+        self.assertEqual(second.first_name, '')
+
+    def test_logout_invalidates_cache(self):
+        self.authenticate()
+        Token.objects.filter(user=self.user).delete()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_deactivation_invalidates_cache(self):
+        self.authenticate()
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_cached_inactive_user_is_rejected(self):
+        token_cache.set(self.token.key, (self.user.pk, False, ()))
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_password_is_not_cached(self):
+        self.authenticate()
+        _, _, values = token_cache.get(self.token.key)
+        self.assertNotIn(self.user.password, values)
+        user, _ = self.authenticate()
+        with self.assertNumQueries(1):
+            self.assertTrue(user.check_password('secret'))
+
+    def test_admin_deletion_invalidates_cache(self):
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@foodgram.ru', password='secret')
+        self.client.force_login(admin)
+        self.authenticate()
+        self.client.post(reverse('admin:recipes_user_changelist'), {
+            'action': 'delete_selected', '_selected_action': [self.user.pk],
+            'post': 'yes'})
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+
+@override_settings(TOKEN_CACHE_SHARED=True)
+class SharedCachedTokenAuthenticationTests(CachedTokenAuthenticationTests):
+
+    def test_invalidation_reaches_other_processes(self):
+        # Другой процесс — отдельный экземпляр TokenCache со своей памятью.
+        other = TokenCache()
+        self.authenticate()
+        self.assertIsNotNone(other.get(self.token.key))
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(other.get(self.token.key))
+
+
+class UserStateTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='cook', email='cook@foodgram.ru', password='secret')
+        User.objects.filter(pk=self.user.pk).update(state_version=1)
+        token = Token.objects.create(user=self.user)
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Token {token.key}'
+        self.url = '/api/users/me/state/'
+
+    def test_matching_etag_returns_304(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_is_compared_exactly(self):
+        etag = f'"{self.user.pk}1-1"'
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_etag_list_and_weak_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        for header in (f'"0-0", {etag}', f'W/{etag}', '*'):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=header)
+            self.assertEqual(response.status_code, 304)
+
+
+class TwoPerMinuteThrottle(HeavyRateThrottle):
+    rate = '2/min'
+
+
+class ThrottlingTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.request = Request(APIRequestFactory().get('/api/recipes/'))
+
+    def test_heavy_scope_is_limited(self):
+        view = SimpleNamespace(throttle_scope=HEAVY_SCOPE, action='get_link')
+        allowed = [TwoPerMinuteThrottle().allow_request(self.request, view)
+                   for _ in range(3)]
+        self.assertEqual(allowed, [True, True, False])
+
+    def test_light_action_is_not_limited(self):
+        view = SimpleNamespace(throttle_scope=None, action='list')
+        for _ in range(3):
+            self.assertTrue(
+                TwoPerMinuteThrottle().allow_request(self.request, view))
+
+    @override_settings(HEAVY_REQUESTS_LIMIT=1)
+    def test_concurrency_limit_is_shared(self):
+        def view_func(request):
+            pass
+        view_func.initkwargs = {'throttle_scope': HEAVY_SCOPE}
+        first = ConcurrencyLimitMiddleware(None)
+        second = ConcurrencyLimitMiddleware(None)
+        request = APIRequestFactory().get('/')
+        self.assertIsNone(first.process_view(request, view_func, (), {}))
+        response = second.process_view(
+            APIRequestFactory().get('/'), view_func, (), {})
+        self.assertEqual(response.status_code, 503)
+        first.release(*request.heavy_slot)
+        self.assertIsNone(second.process_view(
+            APIRequestFactory().get('/'), view_func, (), {}))
+
+    @override_settings(HEAVY_REQUESTS_LIMIT=1)
+    def test_expired_slot_taken_by_another_request_is_kept(self):
+        def view_func(request):
+            pass
+        view_func.initkwargs = {'throttle_scope': HEAVY_SCOPE}
+        middleware = ConcurrencyLimitMiddleware(lambda request: None)
+        slow, fast = APIRequestFactory().get('/'), APIRequestFactory().get('/')
+        middleware.process_view(slow, view_func, (), {})
+        cache.delete(slow.heavy_slot[0])
+        self.assertIsNone(middleware.process_view(fast, view_func, (), {}))
+        middleware(slow)
+        response = middleware.process_view(
+            APIRequestFactory().get('/'), view_func, (), {})
+        self.assertEqual(response.status_code, 503)
+
+
+class WorkerStartupTests(TestCase):
+
+    def test_broken_connection_is_closed_before_request(self):
+        connection.ensure_connection()
+        with mock.patch.object(connection, 'is_usable', return_value=False), \
+                mock.patch.object(connection, 'close') as close:
+            check_db_connections(sender=None)
+        close.assert_called_once()
+
+    @override_settings(CONN_HEALTH_CHECKS=False)
+    def test_health_check_can_be_disabled(self):
+        with mock.patch.object(connection, 'is_usable') as is_usable:
+            check_db_connections(sender=None)
+        is_usable.assert_not_called()
+
+    def test_warm_up_does_not_touch_caches(self):
+        cache.clear()
+        warm_up()
+        self.assertIsNotNone(ingredient_index.built_at)
+        self.assertFalse(cache._cache)
+
+
+class AsyncReadViewsTests(TestCase):
+
+    def setUp(self):
+        self.reload_urls(True)
+        self.addCleanup(self.reload_urls, False)
+
+    def reload_urls(self, enabled):
+        with override_settings(ASYNC_READ_VIEWS=enabled):
+            importlib.reload(api_urls)
+            importlib.reload(project_urls)
+        clear_url_caches()
+
+    def test_reads_are_async(self):
+        for path, view in (
+                ('/api/recipes/', async_views.recipe_list),
+                ('/api/recipes/1/', async_views.recipe_detail),
+                ('/api/tags/1/', async_views.tag_detail),
+                ('/s/abc', async_views.short_link)):
+            self.assertIs(resolve(path).func, view)
+            self.assertTrue(asyncio.iscoroutinefunction(view))
+
+    def test_router_actions_are_not_shadowed(self):
+        for path in ('/api/recipes/download_shopping_cart/',
+                     '/api/recipes/available/', '/api/recipes/1/get-link/',
+                     '/api/recipes/1/similar/'):
+            self.assertNotIn(resolve(path).func, (
+                async_views.recipe_list, async_views.recipe_detail))
+
+
+@override_settings(RESPONSE_CACHE_TTL=60)
+class AnonymousResponseCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        Tag.objects.create(name='Завтрак', slug='breakfast')
+
+    def test_cached_per_media_type(self):
+        url = reverse('tag-list')
+        plain = self.client.get(url, HTTP_ACCEPT='application/json')
+        indented = self.client.get(
+            url, HTTP_ACCEPT='application/json; indent=4')
+        self.assertNotIn(b'\n', plain.content)
+        self.assertIn(b'\n', indented.content)
+        with self.assertNumQueries(0):
+            cached = self.client.get(
+                url, HTTP_ACCEPT='application/json; indent=4')
+        self.assertEqual(cached.content, indented.content)
+
+
+@override_settings(METRICS_ALLOWED_IPS=['10.0.0.0/8'], METRICS_TOKEN='',
+                   METRICS_TRUSTED_PROXIES=['172.16.0.0/12'])
+class MetricsAccessTests(SimpleTestCase):
+
+    def allowed(self, remote_addr, **headers):
+        return allowed(APIRequestFactory().get(
+            '/metrics', REMOTE_ADDR=remote_addr, **headers))
+
+    def test_direct_client(self):
+        self.assertTrue(self.allowed('10.1.2.3'))
+        self.assertFalse(self.allowed('8.8.8.8'))
+
+    def test_client_behind_trusted_proxy(self):
+        self.assertTrue(self.allowed('172.18.0.5', HTTP_X_REAL_IP='10.1.2.3'))
+        self.assertFalse(self.allowed('172.18.0.5', HTTP_X_REAL_IP='8.8.8.8'))
+
+    def test_header_from_untrusted_client_is_ignored(self):
+        self.assertFalse(self.allowed('8.8.8.8', HTTP_X_REAL_IP='10.1.2.3'))
+
+
+class ProfileModeTests(SimpleTestCase):
+
+    def mode(self, **params):
+        return profile_mode(APIRequestFactory().get('/api/recipes/', **params))
+
+    def test_known_modes(self):
+        self.assertEqual(self.mode(data={'profile': 'inline'}), 'inline')
+        self.assertEqual(self.mode(data={'profile': 'True'}), 'save')
+        self.assertEqual(self.mode(HTTP_X_PROFILE='1'), 'save')
+
+    def test_off_and_unknown_values(self):
+        for value in ('0', 'false', '', 'yes'):
+            with self.subTest(value=value):
+                self.assertIsNone(self.mode(data={'profile': value}))
+                self.assertIsNone(self.mode(HTTP_X_PROFILE=value))
+        self.assertIsNone(self.mode())
+
+    def test_parameter_overrides_header(self):
+        self.assertIsNone(
+            self.mode(data={'profile': '0'}, HTTP_X_PROFILE='inline'))
+
+
+class SimilarRecipesTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        author = User.objects.create_user(
+            username='author', email='author@foodgram.ru')
+        self.recipe = Recipe.objects.create(
+            author=author, name='Омлет', text='Текст', cooking_time=5,
+            image='recipes/image.png')
+
+    def test_unknown_recipe_returns_404(self):
+        response = self.client.get(
+            reverse('recipe-similar', args=(self.recipe.pk + 1,)))
+        self.assertEqual(response.status_code, 404)
+
+    def test_recipe_without_similar_returns_empty_list(self):
+        response = self.client.get(
+            reverse('recipe-similar', args=(self.recipe.pk,)))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [])
+
+
+class RecipeFilterTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        author = User.objects.create_user(
+            username='author', email='author@foodgram.ru')
+        breakfast = Tag.objects.create(name='Завтрак', slug='breakfast')
+        lunch = Tag.objects.create(name='Обед', slug='lunch')
+        self.recipe = Recipe.objects.create(
+            author=author, name='Омлет', text='Текст', cooking_time=5,
+            image='recipes/image.png')
+        self.recipe.tags.set((breakfast, lunch))
+
+    def test_recipe_with_several_tags_is_listed_once(self):
+        response = self.client.get(
+            reverse('recipe-list'), {'tags': ['breakfast', 'lunch']})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 1)
+
+    def test_unknown_tag_returns_400(self):
+        response = self.client.get(
+            reverse('recipe-list'), {'tags': ['breakfast', 'dinner']})
+        self.assertEqual(response.status_code, 400)
+
+    def test_plain_dict_data(self):
+        recipes = RecipeFilter(
+            {'tags': 'lunch'}, queryset=Recipe.objects.all()).qs
+        self.assertEqual(list(recipes), [self.recipe])
+
+
+class QueryPlanProblemsTests(SimpleTestCase):
+
+    def setUp(self):
+        self.command = CheckQueryPlansCommand()
+
+    def test_postgresql_seq_scan_is_error(self):
+        plan = {'Node Type': 'Limit', 'Plans': [
+            {'Node Type': 'Seq Scan', 'Relation Name': 'recipes_recipe'}]}
+        self.assertEqual(self.command.postgresql_problems(plan), (
+            ['Seq Scan on recipes_recipe'], []))
+
+    def test_postgresql_sort_over_index_is_warning(self):
+        plan = {'Node Type': 'Sort', 'Plans': [
+            {'Node Type': 'Index Scan', 'Relation Name': 'recipes_favorite',
+             'Index Cond': '(user_id = 1)'}]}
+        self.assertEqual(self.command.postgresql_problems(plan), (
+            [], ['Sort over Index Scan on recipes_favorite']))
+
+    def test_postgresql_sort_over_full_index_scan_is_error(self):
+        plan = {'Node Type': 'Sort', 'Plans': [
+            {'Node Type': 'Index Scan', 'Relation Name': 'recipes_recipe'}]}
+        self.assertEqual(self.command.postgresql_problems(plan), (
+            ['Sort over Index Scan on recipes_recipe'], []))
+
+    def test_sqlite_sort_without_scan_is_warning(self):
+        plan = ('SEARCH recipes_favorite USING INDEX fav_idx (user_id=?)\n'
+                'USE TEMP B-TREE FOR ORDER BY')
+        self.assertEqual(
+            self.command.sqlite_problems(plan, Recipe.objects.all()),
+            ([], ['USE TEMP B-TREE FOR ORDER BY']))
+
+    def test_sqlite_scan_is_error(self):
+        plan = 'SCAN recipes_recipe\nUSE TEMP B-TREE FOR ORDER BY'
+        self.assertEqual(
+            self.command.sqlite_problems(plan, Recipe.objects.all()),
+            (['SCAN recipes_recipe', 'USE TEMP B-TREE FOR ORDER BY'], []))
+
+    def test_sqlite_primary_key_page_is_not_error(self):
+        plan = 'SCAN recipes_recipe'
+        self.assertEqual(
+            self.command.sqlite_problems(plan, Recipe.objects.all()[:6]),
+            ([], []))
+
+
+class RecipeTagsSerializer(serializers.ModelSerializer):
+    tags = serializers.SlugRelatedField(
+        many=True, read_only=True, slug_field='slug')
+
+    class Meta:
+        model = Recipe
+        fields = ('name', 'tags')
+
+
+class RecipeTagsView(generics.ListAPIView):
+    queryset = Recipe.objects.all()
+    serializer_class = RecipeTagsSerializer
+    permission_classes = ()
+    pagination_class = None
+
+
+class QueryTrackingTests(TestCase):
+
+    def setUp(self):
+        author = User.objects.create_user(
+            username='author', email='author@foodgram.ru')
+        tag = Tag.objects.create(name='Завтрак', slug='breakfast')
+        for number in range(N_PLUS_ONE_THRESHOLD + 1):
+            recipe = Recipe.objects.create(
+                author=author, name=f'Рецепт {number}', text='Текст',
+                cooking_time=5, image='recipes/image.png')
+            recipe.tags.add(tag)
+        self.request = APIRequestFactory().get('/api/recipes/')
+
+    def test_loop_over_relation_is_reported(self):
+        with self.assertLogs('api.query_tracking', 'WARNING') as logs:
+            with track_queries(label='test'):
+                RecipeTagsView.as_view()(self.request)
+        self.assertIn('RecipeTagsSerializer.tags', logs.output[0])
+
+    def test_prefetched_relation_is_not_reported(self):
+        view = RecipeTagsView.as_view(
+            queryset=Recipe.objects.prefetch_related('tags'))
+        with track_queries(strict=True) as tracker:
+            response = view(self.request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(max(tracker.counts.values()), 1)
+
+
+@skipUnless(connection.vendor == 'postgresql',
+            'Планы запросов проверяются на PostgreSQL')
+class QueryPlanTests(TestCase):
+
+    def test_hot_queries_use_indexes(self):
+        output = io.StringIO()
+        with redirect_stdout(output):
+            try:
+                call_command('check_query_plans', recipes=2000)
+            except CommandError as error:
+                self.fail(f'{error}\n{output.getvalue()}')
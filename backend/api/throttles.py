@@ -0,0 +1,109 @@
+import time
+
+from django.core.cache import cache
+from rest_framework.throttling import SimpleRateThrottle
+
+from .constants import (HEAVY_LIMIT, HEAVY_RECIPES_LIMIT, HEAVY_SCOPE,
+                        SUBSCRIPTIONS_ACTION)
+
+
+def is_heavy(request, scope=None, action=None):
+    """Запрос к дорогому действию или с большой выборкой.
+
+    Дорогие действия объявляют throttle_scope='heavy' в @action.
+    """
+    if scope == HEAVY_SCOPE:
+        return True
+    limit = request.GET.get('limit', '')
+    if limit.isdigit() and int(limit) > HEAVY_LIMIT:
+        return True
+    if action == SUBSCRIPTIONS_ACTION:
+        recipes_limit = request.GET.get('recipes_limit', '')
+        return (not recipes_limit.isdigit()
+                or int(recipes_limit) > HEAVY_RECIPES_LIMIT)
+    return False
+
+
+class SlidingWindowThrottle(SimpleRateThrottle):
+    """Ограничение частоты по скользящему окну.
+
+    Скорость задается как в DRF, например 60/min. Счетчики запросов
+    за текущую и предыдущую минуту лежат в кеше и увеличиваются
+    атомарным incr, поэтому с общим кешем (MEMCACHED_LOCATION) лимит
+    один на все воркеры и потоки. Число запросов за последнюю минуту
+    оценивается как текущий счетчик плюс оставшаяся доля предыдущего.
+    """
+
+    def get_ident_key(self, request):
+        if request.user and request.user.is_authenticated:
+            return f'user:{request.user.pk}'
+        return f'ip:{self.get_ident(request)}'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {
+            'scope': self.scope, 'ident': self.get_ident_key(request)}
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        window, offset = divmod(time.time(), self.duration)
+        key = f'{self.key}:{int(window)}'
+        cache.add(key, 0, self.duration * 2)
+        try:
+            current = cache.incr(key)
+        except ValueError:
+            # Счетчик вытеснен из кеша между add и incr.
+            cache.set(key, 1, self.duration * 2)
+            current = 1
+        previous = cache.get(f'{self.key}:{int(window) - 1}', 0)
+        share = 1 - offset / self.duration
+        if current + previous * share <= self.num_requests:
+            return True
+        try:
+            cache.decr(key)
+        except ValueError:
+            pass
+        self.retry_after = self.retry_time(current - 1, previous, offset)
+        return False
+
+    def retry_time(self, current, previous, offset):
+        """Секунды до момента, когда запрос уложится в лимит."""
+        if current >= self.num_requests or not previous:
+            return self.duration - offset
+        share = (self.num_requests - current) / previous
+        return max(0, self.duration * (1 - share) - offset)
+
+    def wait(self):
+        return self.retry_after
+
+
+class UserRateThrottle(SlidingWindowThrottle):
+    scope = 'user'
+
+    def get_cache_key(self, request, view):
+        if not request.user.is_authenticated:
+            return None
+        return super().get_cache_key(request, view)
+
+
+class AnonRateThrottle(SlidingWindowThrottle):
+    scope = 'anon'
+
+    def get_cache_key(self, request, view):
+        if request.user.is_authenticated:
+            return None
+        return super().get_cache_key(request, view)
+
+
+class HeavyRateThrottle(SlidingWindowThrottle):
+    """Отдельный лимит для дорогих запросов, см. is_heavy()."""
+    scope = HEAVY_SCOPE
+
+    def get_cache_key(self, request, view):
+        if not is_heavy(request, getattr(view, 'throttle_scope', None),
+                        getattr(view, 'action', None)):
+            return None
+        return super().get_cache_key(request, view)
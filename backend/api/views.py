@@ -1,26 +1,37 @@
-import os
-
-from django.db.models import F, Sum
 from django.contrib.auth import get_user_model
-from django.http import HttpResponse
+from django.core.cache import cache
+from django.db.models import Count, Exists, F, OuterRef, Sum, Value
+from django.http import HttpResponse, HttpResponsePermanentRedirect
 from django.shortcuts import get_object_or_404
+from django.utils.http import parse_etags
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
 from rest_framework import permissions, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from urlshortner.utils import shorten_url
+from urlshortner.views import redirect_to_url
 
+from recipes.ingredient_index import ingredient_index
+from recipes.jobs import enqueue
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
                             ShoppingList, Subscribe, Tag)
-from .filters import IngredientFilter, RecipeFilter
+from .constants import (AVAILABLE_RECIPES_LIMIT, FACETS_CACHE_KEY,
+                        FACETS_CACHE_TTL, FACETS_IGNORED_PARAMS, FACETS_PARAM,
+                        HEAVY_SCOPE, TRUE_VALUES)
+from .filters import IngredientFilter, RecipeFilter, UserFilter
+from .metrics import cache_access
 from .paginations import CustomPagination
 from .permissions import IsAuthorOrReadOnly
-from .serializers import (AvatarSerializer, IngredientSerializer,
+from .response_cache import AnonymousCacheMixin
+from .serializers import (AvailableRecipeSerializer,
+                          AvailableRecipesQuerySerializer, AvatarSerializer,
+                          CutRecipeSerializer, IngredientSerializer,
                           UserGetSerializer, FavoriteSerializer,
                           RecipeSerializer, RecipeWriteSerializer,
                           ShoppingListSerializer, SubscribeSerializer,
-                          SubscribeUserSerializer, TagSerializer)
+                          SubscribeUserSerializer, TagSerializer,
+                          UserStateSerializer)
+from .short_links import decode, encode
 
 User = get_user_model()
 
@@ -29,28 +40,66 @@ class UserDjoserViewSet(UserViewSet):
     queryset = User.objects.all()
     serializer_class = UserGetSerializer
     pagination_class = CustomPagination
+    filter_backends = (DjangoFilterBackend,)
+    filterset_class = UserFilter
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        user = self.request.user
+        if user.is_authenticated:
+            queryset = queryset.annotate(is_subscribed=Exists(
+                Subscribe.objects.filter(user=user, author=OuterRef('pk'))))
+        return queryset
 
     @action(detail=False, permission_classes=[permissions.IsAuthenticated])
     def me(self, request):
         return super().me(request)
 
+    def perform_destroy(self, instance):
+        instance.is_active = False
+        instance.save(update_fields=('is_active',))
+        enqueue('delete_user', key=f'delete_user:{instance.pk}',
+                user_id=instance.pk)
+
     @action(methods=['PUT', 'DELETE'], detail=False,
             permission_classes=[permissions.IsAuthenticated],
             url_path='me/avatar')
     def avatar(self, request):
+        old_avatar = request.user.avatar.name
         if request.method == 'PUT':
             serializer = AvatarSerializer(request.user, data=request.data)
             serializer.is_valid(raise_exception=True)
             serializer.save()
+            if old_avatar:
+                enqueue('delete_file', name=old_avatar)
             return Response(serializer.data)
-        if request.user.avatar:
-            os.remove(request.user.avatar.path)
+        if old_avatar:
+            enqueue('delete_file', name=old_avatar)
             request.user.avatar = None
             request.user.save()
             return Response(status=status.HTTP_204_NO_CONTENT)
         return Response({'errors': 'У вас нет аватара'},
                         status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=False, permission_classes=[permissions.IsAuthenticated],
+            url_path='me/state')
+    def state(self, request):
+        """Отсортированные id избранного, покупок и подписок.
+
+        Версия меняется только при добавлении или удалении,
+        поэтому клиент может хранить снимок и проверять его по ETag.
+        """
+        user = User.objects.only('state_version').get(pk=request.user.pk)
+        etag = f'"{user.pk}-{user.state_version}"'
+        etags = parse_etags(request.headers.get('If-None-Match', ''))
+        if etag in etags or f'W/{etag}' in etags or '*' in etags:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(UserStateSerializer(user).data)
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
     @action(methods=['POST', 'DELETE'], detail=True,
             permission_classes=[permissions.IsAuthenticated])
     def subscribe(self, request, id=None):
@@ -71,45 +120,127 @@ class UserDjoserViewSet(UserViewSet):
     @action(detail=False, permission_classes=[permissions.IsAuthenticated])
     def subscriptions(self, request):
         followings = User.objects.filter(
-            following__user=request.user).prefetch_related('recipes')
+            following__user=request.user).annotate(
+            is_subscribed=Value(True)).prefetch_related('recipes')
         pages = self.paginate_queryset(followings)
         serializer = SubscribeUserSerializer(
             pages, many=True, context={'request': request})
         return self.get_paginated_response(serializer.data)
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(AnonymousCacheMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(AnonymousCacheMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientFilter
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(AnonymousCacheMixin, viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     pagination_class = CustomPagination
     permission_classes = (IsAuthorOrReadOnly,)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
     http_method_names = ('get', 'post', 'patch', 'delete')
+    throttle_scope = None
 
     def get_serializer_class(self):
         if self.request.method == 'GET':
             return RecipeSerializer
         return RecipeWriteSerializer
 
-    @action(detail=True, url_path='get-link')
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        if request.query_params.get(
+                FACETS_PARAM, '').lower() in TRUE_VALUES:
+            response.data['facets'] = {'tags': self.get_tag_facets()}
+        return response
+
+    def get_tag_facets(self):
+        """Число рецептов по каждому тегу при текущих фильтрах.
+
+        Фильтр по тегам не учитывается, чтобы счетчики показывали,
+        сколько рецептов даст выбор каждого тега. Для запроса без
+        фильтров счетчики берутся из кеша.
+        """
+        params = self.request.query_params.copy()
+        for param in FACETS_IGNORED_PARAMS:
+            params.pop(param, None)
+        if not params:
+            facets = cache.get(FACETS_CACHE_KEY)
+            cache_access('tag_facets', facets is not None)
+            if facets is not None:
+                return facets
+        recipes = RecipeFilter(
+            params, queryset=Recipe.objects.all(), request=self.request).qs
+        counts = Recipe.tags.through.objects.filter(
+            recipe__in=recipes.order_by().values('pk')).values(
+            'tag_id', 'tag__slug').annotate(total=Count('recipe_id'))
+        facets = [
+            {'id': row['tag_id'], 'slug': row['tag__slug'],
+             'count': row['total']}
+            for row in counts.order_by('tag__slug')]
+        if not params:
+            cache.set(FACETS_CACHE_KEY, facets, FACETS_CACHE_TTL)
+        return facets
+
+    def perform_create(self, serializer):
+        recipe = serializer.save()
+        enqueue('refresh_similar', key=f'refresh_similar:{recipe.pk}',
+                recipe_id=recipe.pk)
+
+    def perform_update(self, serializer):
+        old_image = serializer.instance.image.name
+        recipe = serializer.save()
+        if old_image != recipe.image.name:
+            enqueue('delete_file', name=old_image)
+        enqueue('refresh_similar', key=f'refresh_similar:{recipe.pk}',
+                recipe_id=recipe.pk)
+
+    def perform_destroy(self, instance):
+        image = instance.image.name
+        instance.delete()
+        enqueue('delete_file', name=image)
+
+    @action(detail=True, url_path='get-link', throttle_scope=HEAVY_SCOPE)
     def get_link(self, request, pk=None):
-        url = request.build_absolute_uri(f'/recipes/{pk}/')
-        url_route = shorten_url(url, is_permanent=False)
-        short_url = request.build_absolute_uri(f'/s/{url_route}')
+        recipe = get_object_or_404(Recipe, pk=pk)
+        short_url = request.build_absolute_uri(f'/s/{encode(recipe.pk)}')
         return Response({'short-link': short_url})
 
+    @action(detail=False)
+    def available(self, request):
+        query = AvailableRecipesQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        tag_ids = Tag.objects.filter(
+            slug__in=query.validated_data.get('tags', [])).values_list(
+            'pk', flat=True)
+        ranked = ingredient_index.search(
+            query.validated_data['ingredients'], list(tag_ids),
+            AVAILABLE_RECIPES_LIMIT)
+        page = self.paginate_queryset(ranked)
+        recipes = Recipe.objects.in_bulk([pk for pk, _ in page])
+        for pk, missing in page:
+            recipes[pk].missing_ingredients = missing
+        serializer = AvailableRecipeSerializer(
+            [recipes[pk] for pk, _ in page if pk in recipes], many=True,
+            context={'request': request})
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=True)
+    def similar(self, request, pk=None):
+        recipe = self.get_object()
+        recipes = Recipe.objects.filter(
+            similar_to__recipe=recipe).order_by('-similar_to__score')
+        serializer = CutRecipeSerializer(
+            recipes, many=True, context={'request': request})
+        return Response(serializer.data)
+
     def __add_or_delete_recipe(
             self, request, model, serializer_class, model_text, pk=None):
         recipe = get_object_or_404(Recipe, pk=pk)
@@ -138,7 +269,8 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return self.__add_or_delete_recipe(
             request, Favorite, FavoriteSerializer, 'избранное', pk)
 
-    @action(detail=False, permission_classes=[permissions.IsAuthenticated])
+    @action(detail=False, permission_classes=[permissions.IsAuthenticated],
+            throttle_scope=HEAVY_SCOPE)
     def download_shopping_cart(self, request):
         ingredients = RecipeIngredient.objects.filter(
             recipe__shoppinglists__user=request.user).values(
@@ -157,3 +289,16 @@ class RecipeViewSet(viewsets.ModelViewSet):
         request = HttpResponse(content, content_type='text/plain')
         request['Content-Disposition'] = f'attachment; filename={filename}'
         return request
+
+
+def short_link_redirect(request, short_url):
+    """Переход по короткой ссылке на рецепт.
+
+    Ссылки, выданные до перехода на вычисляемые коды, ищутся
+    в таблице urlshortner.
+    """
+    recipe_id = decode(short_url)
+    if recipe_id is None:
+        return redirect_to_url(request, short_url)
+    return HttpResponsePermanentRedirect(
+        request.build_absolute_uri(f'/recipes/{recipe_id}/'))
@@ -0,0 +1,52 @@
+"""Продакшн-профиль gunicorn.
+
+Запуск: gunicorn -c foodgram_backend/gunicorn_conf.py foodgram_backend.wsgi
+Режим ASGI: GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker
+и приложение foodgram_backend.asgi.
+"""
+import multiprocessing
+import os
+import shutil
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:7777')
+workers = int(os.getenv(
+    'GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv('GUNICORN_THREADS', 1))
+worker_class = os.getenv(
+    'GUNICORN_WORKER_CLASS', 'gthread' if threads > 1 else 'sync')
+preload_app = True
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 100))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+accesslog = '-'
+
+if os.getenv('METRICS_ENABLED', 'False') == 'True':
+    # Воркеры пишут метрики в общий каталог, /metrics суммирует их.
+    os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/foodgram_metrics')
+
+
+def on_starting(server):
+    directory = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+    if directory:
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory)
+
+
+def post_fork(server, worker):
+    # Соединения, открытые мастером при preload, не должны
+    # разделяться между процессами.
+    from django.db import connections
+    connections.close_all()
+
+
+def post_worker_init(worker):
+    from foodgram_backend.warmup import warm_up
+    warm_up()
+
+
+def child_exit(server, worker):
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -38,8 +38,37 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+if os.getenv('GZIP_RESPONSES', 'False') == 'True':
+    MIDDLEWARE.insert(0, 'api.middleware.CompressionMiddleware')
+    GZIP_MIN_LENGTH = int(os.getenv('GZIP_MIN_LENGTH', 1024))
+
+# Поиск N+1 подменяет свойство сериализаторов DRF, поэтому работает
+# только при разработке.
+N_PLUS_ONE_DETECTION = DEBUG and os.getenv('N_PLUS_ONE_DETECTION', '')
+if N_PLUS_ONE_DETECTION:
+    MIDDLEWARE.append('api.middleware.QueryTrackingMiddleware')
+    N_PLUS_ONE_THRESHOLD = int(os.getenv('N_PLUS_ONE_THRESHOLD', 5))
+
+if os.getenv('PROFILING_ENABLED', 'False') == 'True':
+    MIDDLEWARE.append('api.middleware.ProfilingMiddleware')
+PROFILING_DIR = os.getenv('PROFILING_DIR', BASE_DIR / 'profiles')
+
+EXPORTS_DIR = os.getenv('EXPORTS_DIR', BASE_DIR / 'exports')
+
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'False') == 'True'
+if METRICS_ENABLED:
+    MIDDLEWARE.insert(0, 'api.middleware.MetricsMiddleware')
+    METRICS_ALLOWED_IPS = os.getenv(
+        'METRICS_ALLOWED_IPS', '127.0.0.1').split(',')
+    METRICS_TRUSTED_PROXIES = [
+        proxy for proxy in os.getenv(
+            'METRICS_TRUSTED_PROXIES', '').split(',') if proxy]
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
 ROOT_URLCONF = 'foodgram_backend.urls'
 
+ASYNC_READ_VIEWS = os.getenv('ASYNC_READ_VIEWS', 'False') == 'True'
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -72,12 +101,46 @@ POSTGRESQL = {
         'USER': os.getenv('POSTGRES_USER', 'django'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', 'db'),
         'HOST': os.getenv('DB_HOST', ''),
-        'PORT': os.getenv('DB_PORT', 5432)
+        'PORT': os.getenv('DB_PORT', 5432),
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
     }
 }
 
 DATABASES = SQLITE if DEBUG else POSTGRESQL
 
+if os.getenv('SQLITE_REPLICA_NAME') and DEBUG:
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / os.getenv('SQLITE_REPLICA_NAME'),
+        'TEST': {'MIRROR': 'default'},
+    }
+elif os.getenv('DB_REPLICA_HOST') and not DEBUG:
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': os.getenv('DB_REPLICA_HOST'),
+        'PORT': os.getenv('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+MEMCACHED_LOCATION = os.getenv('MEMCACHED_LOCATION', '')
+
+if MEMCACHED_LOCATION:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+            'LOCATION': MEMCACHED_LOCATION.split(','),
+        }
+    }
+
+CONN_HEALTH_CHECKS = os.getenv('CONN_HEALTH_CHECKS', 'True') == 'True'
+
+if 'replica' in DATABASES:
+    DATABASE_ROUTERS = ['api.db_routers.ReplicaRouter']
+    MIDDLEWARE.insert(
+        MIDDLEWARE.index('django.middleware.common.CommonMiddleware'),
+        'api.middleware.ReplicaRoutingMiddleware')
+    REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', 5))
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -106,16 +169,58 @@ STATIC_ROOT = BASE_DIR / 'collected_static'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+DEFAULT_FILE_STORAGE = 'recipes.storage.ContentAddressedStorage'
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'recipes.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ),
 }
 
+if os.getenv('FAST_JSON', 'True') == 'True':
+    REST_FRAMEWORK.update({
+        'DEFAULT_RENDERER_CLASSES': (
+            'api.renderers.ORJSONRenderer',
+            'rest_framework.renderers.BrowsableAPIRenderer',
+        ),
+        'DEFAULT_PARSER_CLASSES': (
+            'api.parsers.ORJSONParser',
+            'rest_framework.parsers.FormParser',
+            'rest_framework.parsers.MultiPartParser',
+        ),
+    })
+
+if os.getenv('THROTTLING', 'False') == 'True':
+    REST_FRAMEWORK.update({
+        'DEFAULT_THROTTLE_CLASSES': (
+            'api.throttles.UserRateThrottle',
+            'api.throttles.AnonRateThrottle',
+            'api.throttles.HeavyRateThrottle',
+        ),
+        'DEFAULT_THROTTLE_RATES': {
+            'user': os.getenv('THROTTLE_USER_RATE', '120/min'),
+            'anon': os.getenv('THROTTLE_ANON_RATE', '60/min'),
+            'heavy': os.getenv('THROTTLE_HEAVY_RATE', '10/min'),
+        },
+    })
+    MIDDLEWARE.append('api.middleware.ConcurrencyLimitMiddleware')
+    HEAVY_REQUESTS_LIMIT = int(os.getenv('HEAVY_REQUESTS_LIMIT', 8))
+    # Слот должен жить дольше любого запроса: воркер gunicorn
+    # перезапускается через GUNICORN_TIMEOUT секунд.
+    HEAVY_SLOT_TIMEOUT = int(os.getenv(
+        'HEAVY_SLOT_TIMEOUT', 2 * int(os.getenv('GUNICORN_TIMEOUT', 30))))
+
+SHORT_LINK_SALT = os.getenv('SHORT_LINK_SALT', 'foodgram')
+
+TOKEN_CACHE_SHARED = os.getenv(
+    'TOKEN_CACHE_SHARED', str(bool(MEMCACHED_LOCATION))) == 'True'
+
+RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', 0))
+
 DJOSER = {
     'LOGIN_FIELD': 'email',
     'HIDE_USERS': False,
@@ -3,12 +3,24 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from api.views import short_link_redirect
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
-    path('s/', include('urlshortner.urls'))
+    path('s/<str:short_url>', short_link_redirect),
 ]
 
+if settings.ASYNC_READ_VIEWS:
+    from api.async_views import short_link
+
+    urlpatterns.insert(0, path('s/<str:short_url>', short_link))
+
+if settings.METRICS_ENABLED:
+    from api.metrics import metrics_view
+
+    urlpatterns.append(path('metrics', metrics_view))
+
 if settings.DEBUG:
     urlpatterns += static(
         settings.STATIC_URL, document_root=settings.STATIC_ROOT)
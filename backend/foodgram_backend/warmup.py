@@ -0,0 +1,32 @@
+import logging
+
+from django.db import connections
+from django.urls import resolve
+from rest_framework.settings import api_settings
+
+from recipes.ingredient_index import ingredient_index
+
+logger = logging.getLogger(__name__)
+
+WARMUP_URLS = ('/api/recipes/', '/api/tags/', '/api/ingredients/',
+               '/api/users/')
+
+
+def warm_up():
+    """Готовит воркер к приему запросов.
+
+    Открывает постоянные соединения с базами, строит индекс ингредиентов,
+    заполняет кеш резолвера URL и импортирует представления, сериализаторы,
+    рендереры и парсеры. Запросы через приложение не отправляются, поэтому
+    прогрев не попадает в метрики, лимиты частоты и кеш ответов.
+    """
+    for connection in connections.all():
+        connection.ensure_connection()
+    ingredient_index.build()
+    for url in WARMUP_URLS:
+        resolve(url)
+    renderer, *others = api_settings.DEFAULT_RENDERER_CLASSES
+    renderer().render({'warmup': [1, 'a', None]})
+    for cls in (*others, *api_settings.DEFAULT_PARSER_CLASSES):
+        cls()
+    logger.info('Воркер прогрет')
@@ -1,13 +1,22 @@
 from django import forms
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.contrib.admin.actions import delete_selected
+from django.contrib.admin.options import IS_POPUP_VAR
+from django.contrib.admin.templatetags.admin_urls import add_preserved_filters
 from django.contrib.auth.forms import UserChangeForm, UserCreationForm
 from django.contrib.auth.models import Group
 from django.contrib.auth.admin import UserAdmin as MainUserAdmin
-from django.core.exceptions import ValidationError
+from django.core.exceptions import PermissionDenied, ValidationError
 from django.forms.models import BaseInlineFormSet
+from django.http import HttpResponseRedirect
+from django.urls import reverse
 
-from .models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+from .constants import PURGE_BATCH_SIZE
+from .exports import CsvExportMixin
+from .jobs import enqueue
+from .models import (Favorite, Ingredient, Job, Recipe, RecipeIngredient,
                      ShoppingList, Subscribe, Tag, User)
+from .purge import RECIPE_DEPENDENTS, USER_DEPENDENTS, users_deactivated
 
 
 class UserAdminCreationForm(UserCreationForm):
@@ -31,8 +40,61 @@ class UserAdminForm(UserChangeForm):
             self.fields.pop('password')
 
 
+class BackgroundDeletionMixin:
+    """Сообщения админки для моделей, которые удаляются фоновой задачей.
+
+    delete_model и delete_queryset только ставят задачи, поэтому
+    после подтверждения админка сообщает, что удаление поставлено
+    в очередь, а не выполнено.
+    """
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        if 'delete_selected' in actions:
+            _, name, description = actions['delete_selected']
+            actions[name] = (
+                type(self).delete_selected_in_background, name, description)
+        return actions
+
+    def delete_selected_in_background(self, request, queryset):
+        if not request.POST.get('post'):
+            return delete_selected(self, request, queryset)
+        _, _, perms_needed, protected = self.get_deleted_objects(
+            queryset, request)
+        if protected:
+            return delete_selected(self, request, queryset)
+        if perms_needed:
+            raise PermissionDenied
+        count = queryset.count()
+        if count:
+            for obj in queryset:
+                self.log_deletion(request, obj, str(obj))
+            self.delete_queryset(request, queryset)
+            self.message_user(
+                request, f'Поставлено в очередь на удаление: {count}. '
+                         f'Записи исчезнут после выполнения фоновой задачи.',
+                messages.SUCCESS)
+        return None
+
+    def response_delete(self, request, obj_display, obj_id):
+        if IS_POPUP_VAR in request.POST:
+            return super().response_delete(request, obj_display, obj_id)
+        opts = self.model._meta
+        self.message_user(
+            request, f'Удаление «{obj_display}» поставлено в очередь.',
+            messages.SUCCESS)
+        if not self.has_change_permission(request, None):
+            return HttpResponseRedirect(
+                reverse('admin:index', current_app=self.admin_site.name))
+        url = reverse(f'admin:{opts.app_label}_{opts.model_name}_changelist',
+                      current_app=self.admin_site.name)
+        return HttpResponseRedirect(add_preserved_filters({
+            'preserved_filters': self.get_preserved_filters(request),
+            'opts': opts}, url))
+
+
 @admin.register(User)
-class UserAdmin(MainUserAdmin):
+class UserAdmin(BackgroundDeletionMixin, MainUserAdmin):
     form = UserAdminForm
     add_form = UserAdminCreationForm
     list_display = ('id', 'email', 'username', 'first_name', 'last_name',)
@@ -50,6 +112,43 @@ class UserAdmin(MainUserAdmin):
             obj.set_password(form.cleaned_data['password'])
         obj.save()
 
+    def get_deleted_objects(self, objs, request):
+        """Удаляемые пользователи и недостающие права на зависимые записи.
+
+        Зависимые объекты не перечисляются: у активного автора их может
+        быть слишком много для страницы подтверждения. Права проверяются,
+        как в Django, для зарегистрированных в админке моделей, записи
+        которых удалятся вместе с пользователями.
+        """
+        relations = (
+            [(model, field) for model, field in USER_DEPENDENTS]
+            + [(Recipe, 'author')]
+            + [(model, f'{field}__author')
+               for model, field in RECIPE_DEPENDENTS])
+        perms_needed = set()
+        if not self.has_delete_permission(request):
+            perms_needed.add(self.opts.verbose_name)
+        for model, field in relations:
+            model_admin = self.admin_site._registry.get(model)
+            if (model_admin is not None
+                    and model._meta.verbose_name not in perms_needed
+                    and not model_admin.has_delete_permission(request)
+                    and model.objects.filter(
+                        **{f'{field}__in': objs}).exists()):
+                perms_needed.add(model._meta.verbose_name)
+        return [str(obj) for obj in objs], {}, perms_needed, []
+
+    def delete_model(self, request, obj):
+        self.delete_queryset(request, User.objects.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        """Деактивирует пользователей и удаляет их в фоне пачками."""
+        pks = list(queryset.values_list('pk', flat=True))
+        for pk in pks:
+            enqueue('delete_user', key=f'delete_user:{pk}', user_id=pk)
+        queryset.update(is_active=False)
+        users_deactivated.send(sender=User, user_ids=pks)
+
 
 class PageFormSet(BaseInlineFormSet):
 
@@ -67,9 +166,10 @@ class RecipeIngredientInline(admin.TabularInline):
 
 
 @admin.register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(BackgroundDeletionMixin, CsvExportMixin, admin.ModelAdmin):
     list_display = ('id', 'name', 'author', 'favorites_count',)
-    search_fields = ('author', 'name',)
+    export_fields = ('id', 'name', 'author__email', 'cooking_time', 'image',)
+    search_fields = ('author__username', 'name',)
     list_display_links = ('name',)
     list_filter = ('tags',)
     inlines = (RecipeIngredientInline,)
@@ -79,6 +179,16 @@ class RecipeAdmin(admin.ModelAdmin):
     def favorites_count(self, obj):
         return obj.favorites.count()
 
+    def delete_model(self, request, obj):
+        self.delete_queryset(request, Recipe.objects.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        """Удаляет рецепты в фоне пачками по PURGE_BATCH_SIZE."""
+        pks = list(queryset.order_by('pk').values_list('pk', flat=True))
+        for start in range(0, len(pks), PURGE_BATCH_SIZE):
+            enqueue('delete_recipes',
+                    recipe_ids=pks[start:start + PURGE_BATCH_SIZE])
+
 
 @admin.register(Ingredient)
 class IngredientAdmin(admin.ModelAdmin):
@@ -95,21 +205,32 @@ class TagAdmin(admin.ModelAdmin):
 
 
 @admin.register(Favorite)
-class FavoriteAdmin(admin.ModelAdmin):
+class FavoriteAdmin(CsvExportMixin, admin.ModelAdmin):
     list_display = ('id', 'user', 'recipe',)
-    search_fields = ('user', 'recipe',)
+    export_fields = ('id', 'user__email', 'recipe_id', 'recipe__name',)
+    search_fields = ('user__username', 'recipe__name',)
 
 
 @admin.register(ShoppingList)
-class ShoppingListAdmin(admin.ModelAdmin):
+class ShoppingListAdmin(CsvExportMixin, admin.ModelAdmin):
     list_display = ('id', 'user', 'recipe',)
-    search_fields = ('user', 'recipe',)
+    export_fields = ('id', 'user__email', 'recipe_id', 'recipe__name',)
+    search_fields = ('user__username', 'recipe__name',)
 
 
 @admin.register(Subscribe)
-class SubscribeAdmin(admin.ModelAdmin):
+class SubscribeAdmin(CsvExportMixin, admin.ModelAdmin):
     list_display = ('id', 'user', 'author',)
-    search_fields = ('user', 'author',)
+    export_fields = ('id', 'user__email', 'author__email',)
+    search_fields = ('user__username', 'author__username',)
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'status', 'attempts', 'run_at',)
+    list_filter = ('status', 'name',)
+    search_fields = ('key',)
+    readonly_fields = ('created_at', 'updated_at',)
 
 
 admin.site.unregister(Group)
@@ -6,3 +6,30 @@ MAX_LEN_USER_FIELD = 150
 MIN_VALUE_AMOUNT = 1
 MIN_VALUE_COOKING_TIME = 1
 URL_USER_PROFILE = 'me'
+MAX_LEN_JOB_NAME = 64
+MAX_LEN_JOB_KEY = 128
+MAX_LEN_JOB_STATUS = 16
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_DELAY = 30
+JOB_POLL_INTERVAL = 1
+JOB_BATCH_SIZE = 10
+JOB_HEARTBEAT_INTERVAL = 30
+JOB_STALE_TIMEOUT = 120
+JOB_STALE_CHECK_INTERVAL = 60
+MEDIA_GC_MIN_AGE = 24 * 60 * 60
+MEDIA_GC_BATCH_SIZE = 500
+MEDIA_DELETE_GRACE = 60 * 60
+PURGE_BATCH_SIZE = 500
+SIMILAR_RECIPES_COUNT = 10
+SIMILAR_RECIPES_CHUNK = 256
+INGREDIENT_INDEX_TTL = 300
+INGREDIENT_INDEX_VERSION_KEY = 'ingredient_index_version'
+POPULAR_WINDOW_DAYS = 30
+TRENDING_WINDOW_HOURS = 48
+TRENDING_HALF_LIFE_HOURS = 12
+CART_WEIGHT = 0.5
+STATS_REFRESH_HOURS = 2
+STATS_BATCH_SIZE = 500
+TRANSFER_BATCH_SIZE = 1000
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_TTL = 86400
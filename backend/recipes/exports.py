@@ -0,0 +1,162 @@
+import csv
+import os
+import uuid
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib import admin, messages
+from django.contrib.auth import get_user_model
+from django.core.exceptions import PermissionDenied
+from django.http import (FileResponse, HttpRequest, HttpResponseRedirect,
+                         QueryDict)
+from django.urls import path, re_path, reverse
+from django.utils.html import format_html
+from django.views.decorators.http import require_POST
+
+from .constants import EXPORT_CHUNK_SIZE, EXPORT_TTL
+from .jobs import enqueue
+from .models import Job
+
+
+def export_path(name):
+    return os.path.join(settings.EXPORTS_DIR, name)
+
+
+def changelist_queryset(model, params, user_id):
+    """Записи страницы списка админки с фильтрами и поиском params.
+
+    Список собирается заново тем же ModelAdmin от имени сотрудника,
+    который запустил выгрузку, поэтому в задачу передаются только
+    параметры страницы, а не сам запрос.
+    """
+    request = HttpRequest()
+    request.method = 'GET'
+    request.GET = QueryDict(mutable=True)
+    for param, values in params.items():
+        request.GET.setlist(param, values)
+    request.user = get_user_model().objects.get(pk=user_id)
+    model_admin = admin.site._registry[model]
+    return model_admin.get_changelist_instance(request).get_queryset(request)
+
+
+def write_csv(model, fields, name, ids=None, params=None, user_id=None):
+    """Пишет записи в CSV-файл каталога EXPORTS_DIR.
+
+    Выгружаются записи с id из ids или, если ids не заданы, записи
+    страницы списка с параметрами params. Записи читаются через
+    iterator(), на PostgreSQL — серверным курсором пачками
+    по EXPORT_CHUNK_SIZE. Файл пишется под временным именем
+    и переименовывается в конце, поэтому недописанная выгрузка
+    не отдается.
+    """
+    model = apps.get_model(model)
+    if ids is not None:
+        queryset = model.objects.filter(pk__in=ids)
+    else:
+        queryset = changelist_queryset(model, params, user_id)
+    os.makedirs(settings.EXPORTS_DIR, exist_ok=True)
+    file_path = export_path(name)
+    with open(f'{file_path}.part', 'w', newline='',
+              encoding='utf-8') as file:
+        writer = csv.writer(file)
+        writer.writerow(fields)
+        for row in queryset.order_by('pk').values_list(*fields).iterator(
+                chunk_size=EXPORT_CHUNK_SIZE):
+            writer.writerow(row)
+    os.replace(f'{file_path}.part', file_path)
+
+
+class CsvExportMixin:
+    """Выгрузка записей модели в CSV из админки.
+
+    Действие «Выгрузить в CSV» выгружает выбранные записи, кнопка
+    на странице списка (POST-форма с CSRF-токеном) — все записи
+    с учетом фильтров и поиска. Файл пишется фоновой задачей
+    export_csv, а админка сразу показывает ссылку, по которой файл
+    появится после выполнения задачи; через EXPORT_TTL секунд файл
+    удаляется. Выгружаемые поля задаются в export_fields.
+    """
+
+    export_fields = ()
+    actions = ('export_csv',)
+    change_list_template = 'admin/recipes/export_change_list.html'
+
+    def start_export(self, request, ids=None):
+        """Ставит выгрузку в очередь.
+
+        В задачу передаются id выбранных записей или, если ids
+        не заданы, параметры страницы списка из request.GET.
+        """
+        opts = self.model._meta
+        name = f'{opts.model_name}-{uuid.uuid4().hex}.csv'
+        if ids is None:
+            enqueue('export_csv', key=f'export_csv:{name}',
+                    model=opts.label_lower, fields=list(self.export_fields),
+                    name=name, params=dict(request.GET.lists()),
+                    user_id=request.user.pk)
+        else:
+            enqueue('export_csv', key=f'export_csv:{name}',
+                    model=opts.label_lower, fields=list(self.export_fields),
+                    name=name, ids=ids)
+        enqueue('delete_export', delay=EXPORT_TTL, name=name)
+        url = reverse(
+            f'admin:{opts.app_label}_{opts.model_name}_export_download',
+            args=(name,))
+        self.message_user(request, format_html(
+            'Выгрузка поставлена в очередь и будет готова после выполнения '
+            'фоновой задачи. Файл будет доступен <a href="{}">по ссылке</a> '
+            'сутки.', url))
+
+    @admin.action(description='Выгрузить в CSV', permissions=('view',))
+    def export_csv(self, request, queryset):
+        if request.POST.get('select_across') == '1':
+            self.start_export(request)
+        else:
+            self.start_export(
+                request, list(queryset.values_list('pk', flat=True)))
+
+    def export_view(self, request):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        self.start_export(request)
+        opts = self.model._meta
+        url = reverse(f'admin:{opts.app_label}_{opts.model_name}_changelist')
+        return HttpResponseRedirect(f'{url}?{request.GET.urlencode()}')
+
+    def download_view(self, request, name):
+        opts = self.model._meta
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        file_path = export_path(name)
+        if (name.startswith(f'{opts.model_name}-')
+                and os.path.exists(file_path)):
+            return FileResponse(open(file_path, 'rb'), as_attachment=True,
+                                filename=f'{opts.model_name}.csv',
+                                content_type='text/csv; charset=utf-8')
+        job = Job.objects.filter(
+            name='export_csv', key=f'export_csv:{name}').first()
+        if job is not None and job.status in (Job.PENDING, Job.RUNNING):
+            self.message_user(
+                request, 'Выгрузка еще готовится в фоне. Откройте ссылку '
+                         'позже, когда задача export_csv выполнится.',
+                messages.WARNING)
+        elif job is not None and job.status == Job.FAILED:
+            self.message_user(request, 'Выгрузка завершилась ошибкой.',
+                              messages.ERROR)
+        else:
+            self.message_user(request, 'Выгрузка не найдена или уже удалена.',
+                              messages.WARNING)
+        return HttpResponseRedirect(reverse(
+            f'admin:{opts.app_label}_{opts.model_name}_changelist'))
+
+    def get_urls(self):
+        opts = self.model._meta
+        return [
+            path('export/',
+                 self.admin_site.admin_view(require_POST(self.export_view)),
+                 name=f'{opts.app_label}_{opts.model_name}_export'),
+            re_path(r'^export/(?P<name>[\w-]+\.csv)$',
+                    self.admin_site.admin_view(self.download_view),
+                    name=f'{opts.app_label}_{opts.model_name}'
+                         f'_export_download'),
+        ] + super().get_urls()
@@ -0,0 +1,185 @@
+import logging
+import threading
+import time
+
+import numpy as np
+from django.core.cache import cache
+from django.db import connection, transaction
+
+from .constants import INGREDIENT_INDEX_TTL, INGREDIENT_INDEX_VERSION_KEY
+from .models import Recipe, RecipeIngredient
+
+logger = logging.getLogger(__name__)
+
+
+class IngredientIndex:
+    """Инвертированный индекс ингредиент → рецепты в памяти процесса.
+
+    Для каждого ингредиента хранится массив позиций рецептов,
+    для каждого тега — битовая маска рецептов. Изменения рецептов
+    текущего процесса применяются сразу, изменения других процессов
+    подхватываются по версии в общем кеше Django или не позже чем через
+    INGREDIENT_INDEX_TTL секунд. Устаревший индекс перестраивается
+    в фоновом потоке, а запросы тем временем читают прежний.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.built_at = None
+        self.version = None
+        self.rebuilding = False
+
+    def build(self):
+        """Строит индекс по базе и подменяет им текущий."""
+        version = cache.get(INGREDIENT_INDEX_VERSION_KEY)
+        rows = RecipeIngredient.objects.order_by('recipe_id').values_list(
+            'recipe_id', 'ingredient_id')
+        tag_rows = Recipe.tags.through.objects.values_list(
+            'recipe_id', 'tag_id')
+        ingredients = {}
+        for recipe_id, ingredient_id in rows.iterator():
+            ingredients.setdefault(recipe_id, set()).add(ingredient_id)
+        tags = {}
+        for recipe_id, tag_id in tag_rows.iterator():
+            tags.setdefault(recipe_id, set()).add(tag_id)
+        ids = np.fromiter(sorted(ingredients), dtype=np.int64)
+        positions = {pk: pos for pos, pk in enumerate(ids.tolist())}
+        sizes = np.array(
+            [len(ingredients[pk]) for pk in ids.tolist()], dtype=np.int32)
+        postings = {}
+        for pos, pk in enumerate(ids.tolist()):
+            for ingredient_id in ingredients[pk]:
+                postings.setdefault(ingredient_id, []).append(pos)
+        tag_masks = {}
+        for pk, tag_ids in tags.items():
+            if pk in positions:
+                for tag_id in tag_ids:
+                    tag_masks.setdefault(
+                        tag_id, np.zeros(len(ids), dtype=bool))[
+                            positions[pk]] = True
+        with self.lock:
+            self.ids = ids
+            self.positions = positions
+            self.sizes = sizes
+            self.alive = np.ones(len(ids), dtype=bool)
+            self.recipe_ingredients = ingredients
+            self.postings = {
+                ingredient_id: np.array(values, dtype=np.int32)
+                for ingredient_id, values in postings.items()}
+            self.tag_masks = tag_masks
+            self.built_at = time.monotonic()
+            self.version = version
+
+    def rebuild(self):
+        try:
+            self.build()
+        except Exception:
+            logger.exception('Не удалось перестроить индекс ингредиентов')
+        finally:
+            self.rebuilding = False
+            connection.close()
+
+    def tag_mask(self, tag_id):
+        mask = self.tag_masks.get(tag_id)
+        if mask is None or len(mask) < len(self.ids):
+            grown = np.zeros(len(self.ids), dtype=bool)
+            if mask is not None:
+                grown[:len(mask)] = mask
+            mask = self.tag_masks[tag_id] = grown
+        return mask
+
+    def is_stale(self):
+        return (time.monotonic() - self.built_at > INGREDIENT_INDEX_TTL
+                or cache.get(INGREDIENT_INDEX_VERSION_KEY) != self.version)
+
+    def ensure_fresh(self):
+        """Строит индекс при первом обращении, а устаревший
+        перестраивает в фоне, не задерживая запрос.
+        """
+        if self.built_at is None:
+            self.build()
+        elif not self.rebuilding and self.is_stale():
+            self.rebuilding = True
+            threading.Thread(target=self.rebuild, daemon=True).start()
+
+    def schedule_update(self, recipe_id):
+        """Откладывает переиндексацию рецепта до фиксации транзакции."""
+        if self.built_at is not None:
+            transaction.on_commit(lambda: self.update(recipe_id))
+
+    def update(self, recipe_id):
+        """Переиндексирует один рецепт после записи в текущем процессе."""
+        with self.lock:
+            if self.built_at is None:
+                return
+            recipe = Recipe.objects.filter(pk=recipe_id).first()
+            new = set() if recipe is None else set(
+                recipe.ingredient_recipe.values_list(
+                    'ingredient_id', flat=True))
+            pos = self.positions.get(recipe_id)
+            if pos is None:
+                if not new:
+                    return
+                pos = len(self.ids)
+                self.ids = np.append(self.ids, recipe_id)
+                self.sizes = np.append(self.sizes, 0)
+                self.alive = np.append(self.alive, False)
+                self.positions[recipe_id] = pos
+            old = self.recipe_ingredients.get(recipe_id, set())
+            for ingredient_id in old - new:
+                posting = self.postings[ingredient_id]
+                self.postings[ingredient_id] = posting[posting != pos]
+            for ingredient_id in new - old:
+                self.postings[ingredient_id] = np.append(
+                    self.postings.get(
+                        ingredient_id, np.empty(0, dtype=np.int32)), pos)
+            self.recipe_ingredients[recipe_id] = new
+            self.sizes[pos] = len(new)
+            self.alive[pos] = bool(new)
+            tag_ids = set() if recipe is None else set(
+                recipe.tags.values_list('pk', flat=True))
+            for tag_id in set(self.tag_masks) | tag_ids:
+                self.tag_mask(tag_id)[pos] = tag_id in tag_ids
+            self.version = notify_changed()
+
+    def search(self, ingredient_ids, tag_ids=None, limit=None):
+        """Возвращает рецепты, отсортированные по числу недостающих
+        ингредиентов: список пар (id рецепта, сколько не хватает).
+        """
+        with self.lock:
+            self.ensure_fresh()
+            postings = [self.postings[pk] for pk in set(ingredient_ids)
+                        if pk in self.postings]
+            if not postings:
+                return []
+            matched = np.bincount(
+                np.concatenate(postings), minlength=len(self.ids))
+            mask = self.alive & (matched > 0)
+            if tag_ids:
+                tags = np.zeros(len(self.ids), dtype=bool)
+                for tag_id in tag_ids:
+                    if tag_id in self.tag_masks:
+                        tags |= self.tag_mask(tag_id)
+                mask &= tags
+            candidates = np.nonzero(mask)[0]
+            missing = self.sizes[candidates] - matched[candidates]
+            order = np.lexsort((-self.ids[candidates],
+                                -matched[candidates], missing))
+            if limit is not None:
+                order = order[:limit]
+            return list(zip(self.ids[candidates[order]].tolist(),
+                            missing[order].tolist()))
+
+
+def notify_changed():
+    """Сообщает другим процессам, что индекс устарел.
+
+    Версия хранится в кеше Django и видна другим воркерам, только если
+    кеш общий (MEMCACHED_LOCATION).
+    """
+    version = time.time_ns()
+    cache.set(INGREDIENT_INDEX_VERSION_KEY, version, None)
+    return version
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,134 @@
+import logging
+import threading
+import traceback
+from datetime import timedelta
+
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from .constants import (JOB_BATCH_SIZE, JOB_HEARTBEAT_INTERVAL,
+                        JOB_MAX_ATTEMPTS, JOB_RETRY_DELAY, JOB_STALE_TIMEOUT)
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+TASKS = {}
+
+
+def task(func):
+    """Регистрирует функцию как фоновую задачу."""
+    TASKS[func.__name__] = func
+    return func
+
+
+def enqueue(task_name, key=None, delay=0, max_attempts=JOB_MAX_ATTEMPTS,
+            **payload):
+    """Ставит задачу в очередь после фиксации текущей транзакции.
+
+    Пока задача с тем же ключом идемпотентности ждет в очереди,
+    повторная не создается.
+    """
+    if task_name not in TASKS:
+        raise KeyError(f'Задача {task_name} не зарегистрирована')
+
+    def create():
+        try:
+            with transaction.atomic():
+                Job.objects.create(
+                    name=task_name, payload=payload, key=key,
+                    max_attempts=max_attempts,
+                    run_at=timezone.now() + timedelta(seconds=delay))
+        except IntegrityError:
+            logger.info('Задача с ключом %s уже в очереди', key)
+
+    transaction.on_commit(create)
+
+
+def claim(batch_size=JOB_BATCH_SIZE):
+    """Забирает готовые к запуску задачи.
+
+    Захват выполняется условным UPDATE, поэтому несколько воркеров
+    не получат одну и ту же задачу ни на SQLite, ни на PostgreSQL.
+    """
+    candidates = Job.objects.filter(
+        status=Job.PENDING, run_at__lte=timezone.now()).values_list(
+        'pk', flat=True)[:batch_size]
+    jobs = []
+    for pk in candidates:
+        if Job.objects.filter(pk=pk, status=Job.PENDING).update(
+                status=Job.RUNNING, updated_at=timezone.now()):
+            jobs.append(Job.objects.get(pk=pk))
+    return jobs
+
+
+def beat(job_pk):
+    """Отмечает, что задача еще выполняется."""
+    Job.objects.filter(pk=job_pk, status=Job.RUNNING).update(
+        updated_at=timezone.now())
+
+
+def heartbeat(job_pk, stop, interval=JOB_HEARTBEAT_INTERVAL):
+    """Вызывает beat() раз в interval секунд, пока не выставлен stop."""
+    try:
+        while not stop.wait(interval):
+            beat(job_pk)
+    finally:
+        connection.close()
+
+
+def execute(job):
+    """Выполняет задачу, при ошибке планирует повтор с отсрочкой.
+
+    Пока задача выполняется, отдельный поток раз в JOB_HEARTBEAT_INTERVAL
+    секунд обновляет ее updated_at, поэтому долгая задача не считается
+    зависшей.
+    """
+    job.attempts += 1
+    stop = threading.Event()
+    threading.Thread(target=heartbeat, args=(job.pk, stop),
+                     daemon=True).start()
+    try:
+        TASKS[job.name](**job.payload)
+    except Exception:
+        job.last_error = traceback.format_exc()
+        if job.attempts >= job.max_attempts:
+            job.status = Job.FAILED
+            logger.error('Задача %s провалена: %s', job.pk, job.last_error)
+        else:
+            job.status = Job.PENDING
+            job.run_at = timezone.now() + timedelta(
+                seconds=JOB_RETRY_DELAY * 2 ** (job.attempts - 1))
+    else:
+        job.status = Job.DONE
+        job.last_error = ''
+    finally:
+        stop.set()
+    fields = ('status', 'attempts', 'run_at', 'last_error', 'updated_at')
+    try:
+        with transaction.atomic():
+            job.save(update_fields=fields)
+    except IntegrityError:
+        # Повтор не нужен: в очереди уже есть задача с тем же ключом.
+        job.status = Job.FAILED
+        job.save(update_fields=fields)
+    return job.status == Job.DONE
+
+
+def requeue_stale(timeout=JOB_STALE_TIMEOUT):
+    """Возвращает в очередь задачи, зависшие после падения воркера.
+
+    Задача считается зависшей, если ее updated_at не обновлялся
+    дольше timeout секунд, то есть воркер перестал слать heartbeat.
+    """
+    return Job.objects.filter(
+        status=Job.RUNNING,
+        updated_at__lt=timezone.now() - timedelta(seconds=timeout)).update(
+        status=Job.PENDING, updated_at=timezone.now())
+
+
+def run_pending(batch_size=JOB_BATCH_SIZE):
+    """Выполняет одну пачку задач, возвращает число обработанных."""
+    jobs = claim(batch_size)
+    for job in jobs:
+        execute(job)
+    return len(jobs)
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from recipes.constants import SIMILAR_RECIPES_CHUNK, SIMILAR_RECIPES_COUNT
+from recipes.similarity import rebuild_similar_recipes
+
+
+class Command(BaseCommand):
+    help = 'Команда пересчитывает таблицу похожих рецептов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int,
+                            default=SIMILAR_RECIPES_COUNT)
+        parser.add_argument('--chunk', type=int,
+                            default=SIMILAR_RECIPES_CHUNK)
+
+    def handle(self, *args, **options):
+        total = rebuild_similar_recipes(options['count'], options['chunk'])
+        print(f'Похожие рецепты пересчитаны для {total} рецептов')
@@ -0,0 +1,23 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from recipes.constants import TRANSFER_BATCH_SIZE
+from recipes.transfer import export_recipes
+
+
+class Command(BaseCommand):
+    help = ('Команда выгружает рецепты с тегами, ингредиентами и авторами '
+            'в JSONL-файл (или в stdout, если файл не указан).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-')
+        parser.add_argument('--batch', type=int, default=TRANSFER_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        if options['path'] == '-':
+            export_recipes(sys.stdout, options['batch'])
+            return
+        with open(options['path'], 'w', encoding='UTF-8') as file:
+            total = export_recipes(file, options['batch'])
+        print(f'Выгружено рецептов: {total}')
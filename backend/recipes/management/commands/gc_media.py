@@ -0,0 +1,60 @@
+import os
+import time
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from recipes.constants import MEDIA_GC_BATCH_SIZE, MEDIA_GC_MIN_AGE
+from recipes.storage import is_orphan, media_fields, referenced
+
+
+class Command(BaseCommand):
+    help = ('Команда удаляет из хранилища медиа файлы, '
+            'на которые не ссылается ни одна запись.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch', type=int, default=MEDIA_GC_BATCH_SIZE)
+        parser.add_argument('--min-age', type=int, default=MEDIA_GC_MIN_AGE,
+                            help='Не трогать файлы моложе, секунд')
+        parser.add_argument('--dry-run', action='store_true')
+
+    def candidates(self, deadline):
+        upload_dirs = {
+            model._meta.get_field(field).upload_to
+            for model, field in media_fields()}
+        for upload_dir in upload_dirs:
+            root = default_storage.path(upload_dir)
+            for dir_path, _, file_names in os.walk(root):
+                for file_name in file_names:
+                    path = os.path.join(dir_path, file_name)
+                    if os.path.getmtime(path) < deadline:
+                        yield os.path.relpath(
+                            path, default_storage.location).replace('\\', '/')
+
+    def sweep(self, batch, deadline, dry_run):
+        orphans = set(batch) - referenced(batch)
+        if dry_run:
+            return len(orphans)
+        deleted = 0
+        for name in orphans:
+            # Ссылка могла появиться после выборки пачки.
+            if is_orphan(name, deadline):
+                default_storage.delete(name)
+                deleted += 1
+        return deleted
+
+    def handle(self, *args, **options):
+        checked = deleted = 0
+        batch = []
+        deadline = time.time() - options['min_age']
+        for name in self.candidates(deadline):
+            batch.append(name)
+            if len(batch) >= options['batch']:
+                deleted += self.sweep(batch, deadline, options['dry_run'])
+                checked += len(batch)
+                batch = []
+        if batch:
+            deleted += self.sweep(batch, deadline, options['dry_run'])
+            checked += len(batch)
+        action = 'К удалению' if options['dry_run'] else 'Удалено'
+        print(f'Проверено файлов: {checked}. {action}: {deleted}')
@@ -0,0 +1,41 @@
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from recipes.constants import INGREDIENT_INDEX_TTL, TRANSFER_BATCH_SIZE
+from recipes.transfer import import_recipes
+
+
+class Command(BaseCommand):
+    help = ('Команда загружает рецепты из JSONL-файла, созданного '
+            'командой export_recipes (или из stdin, если файл не указан). '
+            'Файлы картинок переносятся отдельно.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-')
+        parser.add_argument('--batch', type=int, default=TRANSFER_BATCH_SIZE)
+
+    def progress(self, created, skipped):
+        print(f'Загружено рецептов: {created}, пропущено: {skipped}',
+              file=sys.stderr)
+
+    def handle(self, *args, **options):
+        if options['path'] == '-':
+            created, skipped, renamed_tags = import_recipes(
+                sys.stdin, options['batch'], self.progress)
+        else:
+            with open(options['path'], encoding='UTF-8') as file:
+                created, skipped, renamed_tags = import_recipes(
+                    file, options['batch'], self.progress)
+        print(f'Импорт завершен. Загружено рецептов: {created}, '
+              f'пропущено: {skipped}')
+        for slug, existing_slug in sorted(renamed_tags.items()):
+            print(f'Тег {slug} сопоставлен по названию с существующим '
+                  f'тегом {existing_slug}')
+        if created and not settings.MEMCACHED_LOCATION:
+            print('Общий кеш (MEMCACHED_LOCATION) не настроен: воркеры API '
+                  'увидят новые рецепты в поиске по ингредиентам через '
+                  f'{INGREDIENT_INDEX_TTL} секунд, в кеше ответов — через '
+                  'RESPONSE_CACHE_TTL секунд. Чтобы изменения были видны '
+                  'сразу, перезапустите воркеры.')
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from recipes.constants import PURGE_BATCH_SIZE
+from recipes.purge import purge_user
+
+
+class Command(BaseCommand):
+    help = ('Команда пачками удаляет пользователя со всеми рецептами, '
+            'избранным, покупками и подписками. Прерванное удаление '
+            'продолжается повторным запуском.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('user_id', type=int)
+        parser.add_argument('--batch', type=int, default=PURGE_BATCH_SIZE)
+
+    def progress(self, label, deleted):
+        print(f'{label}: удалено {deleted}')
+
+    def handle(self, *args, **options):
+        if not purge_user(options['user_id'], options['batch'],
+                          self.progress):
+            print('Пользователь не найден')
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from recipes.constants import STATS_REFRESH_HOURS
+from recipes.popularity import refresh_popularity
+
+
+class Command(BaseCommand):
+    help = ('Команда обновляет почасовые и посуточные счетчики активности '
+            'и рейтинги популярных рецептов. Запускается по расписанию.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=STATS_REFRESH_HOURS,
+                            help='За сколько последних часов пересчитать')
+
+    def handle(self, *args, **options):
+        total = refresh_popularity(options['hours'])
+        print(f'Рейтинги обновлены для {total} рецептов')
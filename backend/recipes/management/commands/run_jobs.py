@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipes.constants import (JOB_BATCH_SIZE, JOB_POLL_INTERVAL,
+                               JOB_STALE_CHECK_INTERVAL)
+from recipes.jobs import requeue_stale, run_pending
+
+
+class Command(BaseCommand):
+    help = 'Команда запускает обработчик фоновых задач из базы данных.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Обработать очередь один раз и выйти')
+        parser.add_argument('--batch', type=int, default=JOB_BATCH_SIZE)
+        parser.add_argument('--sleep', type=float, default=JOB_POLL_INTERVAL)
+
+    def handle(self, *args, **options):
+        print('Обработчик фоновых задач запущен')
+        checked_at = None
+        while True:
+            if (checked_at is None or time.monotonic() - checked_at
+                    > JOB_STALE_CHECK_INTERVAL):
+                requeue_stale()
+                checked_at = time.monotonic()
+            processed = run_pending(options['batch'])
+            if options['once'] and not processed:
+                break
+            if not processed:
+                time.sleep(options['sleep'])
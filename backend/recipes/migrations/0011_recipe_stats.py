@@ -0,0 +1,100 @@
+# Generated by Django 3.2 on 2026-10-19 07:52
+
+from datetime import datetime, timezone
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def backfill_created_at(apps, schema_editor):
+    # Время добавления старых записей неизвестно. Без этого шага
+    # они получили бы время миграции и попали бы в тренды.
+    for name in ('Favorite', 'ShoppingList'):
+        apps.get_model('recipes', name).objects.update(created_at=EPOCH)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_similarrecipe'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeScore',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='score', serialize=False, to='recipes.recipe', verbose_name='Рецепт')),
+                ('popular', models.FloatField(db_index=True, default=0, verbose_name='Популярность')),
+                ('trending', models.FloatField(db_index=True, default=0, verbose_name='Тренд')),
+            ],
+            options={
+                'verbose_name': 'Рейтинг рецепта',
+                'verbose_name_plural': 'Рейтинги рецептов',
+            },
+        ),
+        migrations.AddField(
+            model_name='favorite',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, default=django.utils.timezone.now, verbose_name='Добавлен'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='shoppinglist',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, default=django.utils.timezone.now, verbose_name='Добавлен'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(
+            backfill_created_at, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='HourlyRecipeStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField(verbose_name='Начало периода')),
+                ('favorites', models.PositiveIntegerField(default=0, verbose_name='Добавлений в избранное')),
+                ('carts', models.PositiveIntegerField(default=0, verbose_name='Добавлений в список покупок')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hourly_stats', to='recipes.recipe', verbose_name='Рецепт')),
+            ],
+            options={
+                'verbose_name': 'Активность за час',
+                'verbose_name_plural': 'Активность по часам',
+                'ordering': ('-bucket',),
+                'default_related_name': 'hourly_stats',
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyRecipeStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField(verbose_name='Начало периода')),
+                ('favorites', models.PositiveIntegerField(default=0, verbose_name='Добавлений в избранное')),
+                ('carts', models.PositiveIntegerField(default=0, verbose_name='Добавлений в список покупок')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='recipes.recipe', verbose_name='Рецепт')),
+            ],
+            options={
+                'verbose_name': 'Активность за сутки',
+                'verbose_name_plural': 'Активность по суткам',
+                'ordering': ('-bucket',),
+                'default_related_name': 'daily_stats',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='hourlyrecipestats',
+            index=models.Index(fields=['bucket'], name='hourly_stats_bucket_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='hourlyrecipestats',
+            constraint=models.UniqueConstraint(fields=('recipe', 'bucket'), name='unique_recipe_hour'),
+        ),
+        migrations.AddIndex(
+            model_name='dailyrecipestats',
+            index=models.Index(fields=['bucket'], name='daily_stats_bucket_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyrecipestats',
+            constraint=models.UniqueConstraint(fields=('recipe', 'bucket'), name='unique_recipe_day'),
+        ),
+    ]
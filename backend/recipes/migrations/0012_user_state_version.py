@@ -0,0 +1,18 @@
+# Generated by Django 3.2 on 2026-10-19 07:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_recipe_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='state_version',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Версия избранного, покупок и подписок'),
+        ),
+    ]
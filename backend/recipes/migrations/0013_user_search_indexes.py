@@ -0,0 +1,33 @@
+from django.db import migrations
+
+FIELDS = ('username', 'first_name', 'last_name')
+
+
+def create_indexes(apps, schema_editor):
+    # Индексы под UPPER(поле::text) LIKE 'префикс%', который Django
+    # строит для istartswith в PostgreSQL.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for field in FIELDS:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS recipes_user_{field}_upper_idx '
+            f'ON recipes_user (UPPER({field}::text) text_pattern_ops)')
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for field in FIELDS:
+        schema_editor.execute(
+            f'DROP INDEX IF EXISTS recipes_user_{field}_upper_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_user_state_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -2,9 +2,11 @@ from django.contrib.auth.models import AbstractUser
 from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, RegexValidator
 from django.db import models
+from django.utils import timezone
 
-from .constants import (MAX_LEN_NAME, MAX_LEN_EMAIL, MAX_LEN_USER_FIELD,
-                        MIN_VALUE_AMOUNT, MAX_LEN_SLUG,
+from .constants import (JOB_MAX_ATTEMPTS, MAX_LEN_JOB_KEY, MAX_LEN_JOB_NAME,
+                        MAX_LEN_JOB_STATUS, MAX_LEN_NAME, MAX_LEN_EMAIL,
+                        MAX_LEN_USER_FIELD, MIN_VALUE_AMOUNT, MAX_LEN_SLUG,
                         MAX_LEN_MEASUREMENT_UNIT, MIN_VALUE_COOKING_TIME)
 from .validators import username_validator
 
@@ -88,6 +90,12 @@ class User(AbstractUser):
         upload_to='users',
         blank=True,
         null=True,
+        db_index=True,
+    )
+    state_version = models.PositiveIntegerField(
+        verbose_name='Версия избранного, покупок и подписок',
+        default=0,
+        editable=False,
     )
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
@@ -110,6 +118,7 @@ class Recipe(models.Model):
     image = models.ImageField(
         upload_to='recipes',
         verbose_name='Картинка',
+        db_index=True,
     )
     text = models.TextField(
         verbose_name='Текстовое описание',
@@ -141,6 +150,9 @@ class Recipe(models.Model):
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         default_related_name = 'recipes'
+        indexes = [
+            models.Index(fields=['author', '-id'],
+                         name='recipe_author_id_idx')]
 
     def __str__(self):
         return self.name
@@ -170,6 +182,9 @@ class RecipeIngredient(models.Model):
         verbose_name = 'Ингредиент в рецепте'
         verbose_name_plural = 'Ингредиенты в рецепте'
         default_related_name = 'ingredient_recipe'
+        indexes = [
+            models.Index(fields=['recipe', 'ingredient'],
+                         name='recipe_ingredient_idx')]
 
     def __str__(self):
         return (f'{self.recipe.name}. '
@@ -211,6 +226,40 @@ class Subscribe(models.Model):
         super().clean()
 
 
+class SimilarRecipe(models.Model):
+    """Модель похожих рецептов по пересечению ингредиентов."""
+    recipe = models.ForeignKey(
+        Recipe,
+        verbose_name='Рецепт',
+        on_delete=models.CASCADE,
+        related_name='similar',
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        verbose_name='Похожий рецепт',
+        on_delete=models.CASCADE,
+        related_name='similar_to',
+    )
+    score = models.FloatField(
+        verbose_name='Сходство',
+    )
+
+    class Meta:
+        ordering = ('recipe', '-score')
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'similar'],
+                name='unique_recipe_similar')]
+        indexes = [
+            models.Index(fields=['recipe', '-score'],
+                         name='similar_recipe_score_idx')]
+
+    def __str__(self):
+        return f'{self.recipe} ~ {self.similar}: {self.score:.2f}'
+
+
 class BaseFavoriteAndShoppingList(models.Model):
     """Абстрактная модель для избранного и списка покупок."""
     user = models.ForeignKey(
@@ -223,6 +272,11 @@ class BaseFavoriteAndShoppingList(models.Model):
         verbose_name='Рецепт',
         on_delete=models.CASCADE,
     )
+    created_at = models.DateTimeField(
+        verbose_name='Добавлен',
+        auto_now_add=True,
+        db_index=True,
+    )
 
     class Meta:
         abstract = True
@@ -257,3 +311,163 @@ class ShoppingList(BaseFavoriteAndShoppingList):
             models.UniqueConstraint(
                 fields=['user', 'recipe'],
                 name='unique_user_list')]
+
+
+class Job(models.Model):
+    """Модель фоновой задачи."""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Ошибка'),
+    )
+    name = models.CharField(
+        verbose_name='Задача',
+        max_length=MAX_LEN_JOB_NAME,
+    )
+    payload = models.JSONField(
+        verbose_name='Аргументы',
+        default=dict,
+    )
+    key = models.CharField(
+        verbose_name='Ключ идемпотентности',
+        max_length=MAX_LEN_JOB_KEY,
+        blank=True,
+        null=True,
+    )
+    status = models.CharField(
+        verbose_name='Статус',
+        max_length=MAX_LEN_JOB_STATUS,
+        choices=STATUSES,
+        default=PENDING,
+    )
+    attempts = models.PositiveSmallIntegerField(
+        verbose_name='Попытки',
+        default=0,
+    )
+    max_attempts = models.PositiveSmallIntegerField(
+        verbose_name='Максимум попыток',
+        default=JOB_MAX_ATTEMPTS,
+    )
+    run_at = models.DateTimeField(
+        verbose_name='Запустить после',
+        default=timezone.now,
+    )
+    last_error = models.TextField(
+        verbose_name='Последняя ошибка',
+        blank=True,
+    )
+    created_at = models.DateTimeField(
+        verbose_name='Создана',
+        auto_now_add=True,
+    )
+    updated_at = models.DateTimeField(
+        verbose_name='Обновлена',
+        auto_now=True,
+    )
+
+    class Meta:
+        ordering = ('run_at',)
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        indexes = [
+            models.Index(fields=['status', 'run_at'],
+                         name='job_status_run_at_idx')]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['key'],
+                condition=models.Q(status='pending'),
+                name='unique_pending_job_key')]
+
+    def __str__(self):
+        return f'{self.name} ({self.get_status_display()})'
+
+
+class BaseRecipeStats(models.Model):
+    """Абстрактная модель счетчиков активности рецепта за период."""
+    recipe = models.ForeignKey(
+        Recipe,
+        verbose_name='Рецепт',
+        on_delete=models.CASCADE,
+    )
+    bucket = models.DateTimeField(
+        verbose_name='Начало периода',
+    )
+    favorites = models.PositiveIntegerField(
+        verbose_name='Добавлений в избранное',
+        default=0,
+    )
+    carts = models.PositiveIntegerField(
+        verbose_name='Добавлений в список покупок',
+        default=0,
+    )
+
+    class Meta:
+        abstract = True
+
+    def __str__(self):
+        return f'{self.recipe} {self.bucket}: {self.favorites}/{self.carts}'
+
+
+class HourlyRecipeStats(BaseRecipeStats):
+    """Модель почасовых счетчиков активности рецепта."""
+
+    class Meta:
+        ordering = ('-bucket',)
+        verbose_name = 'Активность за час'
+        verbose_name_plural = 'Активность по часам'
+        default_related_name = 'hourly_stats'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'bucket'],
+                name='unique_recipe_hour')]
+        indexes = [
+            models.Index(fields=['bucket'], name='hourly_stats_bucket_idx')]
+
+
+class DailyRecipeStats(BaseRecipeStats):
+    """Модель посуточных счетчиков активности рецепта."""
+
+    class Meta:
+        ordering = ('-bucket',)
+        verbose_name = 'Активность за сутки'
+        verbose_name_plural = 'Активность по суткам'
+        default_related_name = 'daily_stats'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'bucket'],
+                name='unique_recipe_day')]
+        indexes = [
+            models.Index(fields=['bucket'], name='daily_stats_bucket_idx')]
+
+
+class RecipeScore(models.Model):
+    """Модель рейтингов рецепта, рассчитанных по счетчикам активности."""
+    recipe = models.OneToOneField(
+        Recipe,
+        verbose_name='Рецепт',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='score',
+    )
+    popular = models.FloatField(
+        verbose_name='Популярность',
+        default=0,
+        db_index=True,
+    )
+    trending = models.FloatField(
+        verbose_name='Тренд',
+        default=0,
+        db_index=True,
+    )
+
+    class Meta:
+        verbose_name = 'Рейтинг рецепта'
+        verbose_name_plural = 'Рейтинги рецептов'
+
+    def __str__(self):
+        return f'{self.recipe}: {self.popular:.1f}/{self.trending:.1f}'
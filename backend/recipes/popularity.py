@@ -0,0 +1,113 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+
+from .constants import (CART_WEIGHT, POPULAR_WINDOW_DAYS, STATS_BATCH_SIZE,
+                        STATS_REFRESH_HOURS, TRENDING_HALF_LIFE_HOURS,
+                        TRENDING_WINDOW_HOURS)
+from .models import (DailyRecipeStats, Favorite, HourlyRecipeStats,
+                     RecipeScore, ShoppingList)
+
+
+def collect(trunc, since):
+    """Считает добавления в избранное и покупки по периодам."""
+    counters = defaultdict(lambda: [0, 0])
+    for index, model in enumerate((Favorite, ShoppingList)):
+        rows = model.objects.filter(created_at__gte=since).order_by().annotate(
+            bucket=trunc('created_at')).values('recipe_id', 'bucket').annotate(
+            total=Count('id')).values_list('recipe_id', 'bucket', 'total')
+        for recipe_id, bucket, total in rows.iterator():
+            counters[recipe_id, bucket][index] = total
+    return counters
+
+
+def refresh_rollup(stats_model, trunc, since):
+    """Пересчитывает счетчики активности начиная с периода since."""
+    since = trunc_value(trunc, since)
+    counters = collect(trunc, since)
+    with transaction.atomic():
+        stats_model.objects.filter(bucket__gte=since).delete()
+        stats_model.objects.bulk_create(
+            stats_model(recipe_id=recipe_id, bucket=bucket,
+                        favorites=favorites, carts=carts)
+            for (recipe_id, bucket), (favorites, carts) in counters.items())
+
+
+def trunc_value(trunc, value):
+    value = timezone.localtime(value).replace(
+        minute=0, second=0, microsecond=0)
+    if trunc is TruncDay:
+        value = value.replace(hour=0)
+    return value
+
+
+def refresh_scores(now=None):
+    """Пересчитывает рейтинги рецептов по счетчикам за окно.
+
+    Популярность — сумма активности за POPULAR_WINDOW_DAYS суток,
+    тренд — почасовая активность за TRENDING_WINDOW_HOURS часов
+    с затуханием вдвое каждые TRENDING_HALF_LIFE_HOURS часов.
+    """
+    now = now or timezone.now()
+    scores = defaultdict(lambda: [0.0, 0.0])
+    daily = DailyRecipeStats.objects.filter(
+        bucket__gte=now - timedelta(days=POPULAR_WINDOW_DAYS)).values_list(
+        'recipe_id', 'favorites', 'carts')
+    for recipe_id, favorites, carts in daily.iterator():
+        scores[recipe_id][0] += favorites + CART_WEIGHT * carts
+    hourly = HourlyRecipeStats.objects.filter(
+        bucket__gte=now - timedelta(hours=TRENDING_WINDOW_HOURS)).values_list(
+        'recipe_id', 'bucket', 'favorites', 'carts')
+    for recipe_id, bucket, favorites, carts in hourly.iterator():
+        age = max((now - bucket).total_seconds() / 3600, 0)
+        scores[recipe_id][1] += ((favorites + CART_WEIGHT * carts)
+                                 * 0.5 ** (age / TRENDING_HALF_LIFE_HOURS))
+    save_scores(scores)
+    return len(scores)
+
+
+def save_scores(scores):
+    """Записывает в RecipeScore только изменившиеся рейтинги.
+
+    Новые рейтинги добавляются, изменившиеся обновляются, рейтинги
+    рецептов без активности за окно удаляются.
+    """
+    current = {
+        recipe_id: [popular, trending]
+        for recipe_id, popular, trending in RecipeScore.objects.values_list(
+            'recipe_id', 'popular', 'trending').iterator()}
+    created, updated = [], []
+    for recipe_id, (popular, trending) in scores.items():
+        score = RecipeScore(
+            recipe_id=recipe_id, popular=popular, trending=trending)
+        if recipe_id not in current:
+            created.append(score)
+        elif current[recipe_id] != [popular, trending]:
+            updated.append(score)
+    removed = list(current.keys() - scores.keys())
+    if not (created or updated or removed):
+        return
+    with transaction.atomic():
+        for start in range(0, len(removed), STATS_BATCH_SIZE):
+            RecipeScore.objects.filter(recipe_id__in=removed[
+                start:start + STATS_BATCH_SIZE]).delete()
+        RecipeScore.objects.bulk_update(
+            updated, ('popular', 'trending'), batch_size=STATS_BATCH_SIZE)
+        RecipeScore.objects.bulk_create(created, batch_size=STATS_BATCH_SIZE)
+
+
+def refresh_popularity(hours=STATS_REFRESH_HOURS):
+    """Обновляет счетчики за последние hours часов и рейтинги."""
+    now = timezone.now()
+    since = now - timedelta(hours=hours)
+    refresh_rollup(HourlyRecipeStats, TruncHour, since)
+    refresh_rollup(DailyRecipeStats, TruncDay, since)
+    HourlyRecipeStats.objects.filter(
+        bucket__lt=now - timedelta(hours=TRENDING_WINDOW_HOURS)).delete()
+    DailyRecipeStats.objects.filter(
+        bucket__lt=now - timedelta(days=POPULAR_WINDOW_DAYS)).delete()
+    return refresh_scores(now)
@@ -0,0 +1,153 @@
+import logging
+
+from django.db import connections, router, transaction
+from django.db.models import F, Q
+from django.dispatch import Signal
+
+from .constants import PURGE_BATCH_SIZE
+from .ingredient_index import notify_changed
+from .jobs import enqueue
+from .models import (DailyRecipeStats, Favorite, HourlyRecipeStats, Recipe,
+                     RecipeIngredient, RecipeScore, ShoppingList,
+                     SimilarRecipe, Subscribe, User)
+
+logger = logging.getLogger(__name__)
+
+recipes_purged = Signal()
+users_deactivated = Signal()
+
+# Записи удаляются без каскада, поэтому здесь перечислены все таблицы,
+# ссылающиеся на рецепт.
+RECIPE_DEPENDENTS = (
+    (RecipeIngredient, 'recipe'),
+    (Recipe.tags.through, 'recipe'),
+    (Favorite, 'recipe'),
+    (ShoppingList, 'recipe'),
+    (SimilarRecipe, 'recipe'),
+    (SimilarRecipe, 'similar'),
+    (HourlyRecipeStats, 'recipe'),
+    (DailyRecipeStats, 'recipe'),
+    (RecipeScore, 'recipe'),
+)
+USER_DEPENDENTS = (
+    (Favorite, 'user'),
+    (ShoppingList, 'user'),
+    (Subscribe, 'user'),
+    (Subscribe, 'author'),
+)
+
+
+def log_progress(label, deleted):
+    logger.info('%s: удалено %s', label, deleted)
+
+
+def bump_state_versions(user_ids):
+    """Меняет версию снимка состояния пользователей одним запросом."""
+    if user_ids:
+        User.objects.filter(pk__in=user_ids).update(
+            state_version=F('state_version') + 1)
+
+
+def delete_by_pks(model, pks):
+    """Удаляет строки таблицы модели по первичным ключам одним DELETE.
+
+    QuerySet.delete() здесь не подходит: у избранного, покупок,
+    подписок и рецептов есть обработчики post_delete, поэтому Django
+    выбрал бы каждую запись и отправил сигнал по каждой, а версии
+    состояния и кеши менялись бы на каждую строку. Зависимые записи
+    удаляются явно по RECIPE_DEPENDENTS и USER_DEPENDENTS, каскад не нужен.
+    """
+    connection = connections[router.db_for_write(model)]
+    quote = connection.ops.quote_name
+    placeholders = ', '.join(['%s'] * len(pks))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {quote(model._meta.db_table)} '
+            f'WHERE {quote(model._meta.pk.column)} IN ({placeholders})',
+            pks)
+
+
+def delete_in_batches(queryset, label, batch_size, progress):
+    """Удаляет записи пачками, каждая в своей короткой транзакции.
+
+    Удаление идет одним DELETE без сборщика каскада и сигналов
+    post_delete (см. delete_by_pks): версии состояния и кеши
+    обновляет вызывающий код один раз на пачку.
+    """
+    total = 0
+    while True:
+        with transaction.atomic():
+            pks = list(queryset.order_by('pk').values_list(
+                'pk', flat=True)[:batch_size])
+            if not pks:
+                return total
+            delete_by_pks(queryset.model, pks)
+        total += len(pks)
+        progress(label, total)
+
+
+def purge_recipes(queryset, batch_size=PURGE_BATCH_SIZE,
+                  progress=log_progress):
+    """Удаляет рецепты пачками: сначала зависимые записи, затем сами рецепты.
+
+    Каждая пачка удаляется в отдельных коротких транзакциях, поэтому
+    прерванное удаление можно просто запустить снова. После пачки
+    версии состояния затронутых пользователей, индекс ингредиентов
+    и кеши меняются одним запросом и сигналом recipes_purged.
+    """
+    total = 0
+    while True:
+        recipes = list(queryset.order_by('pk').values_list(
+            'pk', 'image')[:batch_size])
+        if not recipes:
+            return total
+        pks = [pk for pk, _ in recipes]
+        user_ids = list(User.objects.filter(
+            Q(favorites__recipe__in=pks) | Q(shoppinglists__recipe__in=pks)
+        ).values_list('pk', flat=True).distinct())
+        for model, field in RECIPE_DEPENDENTS:
+            delete_in_batches(
+                model.objects.filter(**{f'{field}__in': pks}),
+                model._meta.verbose_name_plural, batch_size,
+                lambda label, deleted: None)
+        with transaction.atomic():
+            delete_by_pks(Recipe, pks)
+            for _, image in recipes:
+                if image:
+                    enqueue('delete_file', name=image)
+        bump_state_versions(user_ids)
+        notify_changed()
+        recipes_purged.send(sender=Recipe, recipe_ids=pks)
+        total += len(pks)
+        progress('Рецепты', total)
+
+
+def purge_user(user_id, batch_size=PURGE_BATCH_SIZE, progress=log_progress):
+    """Удаляет пользователя, его рецепты, избранное, покупки и подписки.
+
+    Пользователь сразу деактивируется, а строка пользователя удаляется
+    последней, поэтому прерванное удаление продолжается повторным
+    вызовом с того места, где остановилось.
+    """
+    user = User.objects.filter(pk=user_id).first()
+    if user is None:
+        return False
+    if user.is_active:
+        user.is_active = False
+        user.save(update_fields=('is_active',))
+    followers = list(User.objects.filter(
+        follower__author=user_id).values_list('pk', flat=True))
+    for model, field in USER_DEPENDENTS:
+        delete_in_batches(
+            model.objects.filter(**{field: user_id}),
+            f'{model._meta.verbose_name_plural} ({field})', batch_size,
+            progress)
+    bump_state_versions(followers)
+    purge_recipes(Recipe.objects.filter(author_id=user_id), batch_size,
+                  progress)
+    with transaction.atomic():
+        User.objects.filter(pk=user_id).delete()
+        if user.avatar:
+            enqueue('delete_file', name=user.avatar.name)
+    progress('Пользователь', 1)
+    return True
@@ -0,0 +1,108 @@
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, Min, Q
+from scipy import sparse
+
+from .constants import SIMILAR_RECIPES_CHUNK, SIMILAR_RECIPES_COUNT
+from .models import Recipe, RecipeIngredient, SimilarRecipe
+
+
+def ingredient_matrix():
+    """Строит нормированную разреженную матрицу рецепт × ингредиент.
+
+    Строки нормированы по длине, поэтому произведение строк дает
+    косинусное сходство наборов ингредиентов.
+    """
+    pairs = np.fromiter(
+        (value for pair in RecipeIngredient.objects.values_list(
+            'recipe_id', 'ingredient_id').iterator() for value in pair),
+        dtype=np.int64)
+    if not len(pairs):
+        return pairs, sparse.csr_matrix((0, 0), dtype=np.float32)
+    recipe_ids, rows = np.unique(pairs[0::2], return_inverse=True)
+    _, columns = np.unique(pairs[1::2], return_inverse=True)
+    matrix = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.float32), (rows, columns)))
+    matrix.data[:] = 1
+    norms = np.sqrt(np.asarray(matrix.sum(axis=1)).ravel())
+    return recipe_ids, sparse.diags(1 / norms) @ matrix
+
+
+def top_neighbours(row, exclude, count=SIMILAR_RECIPES_COUNT):
+    """Возвращает индексы и значения count наибольших оценок строки."""
+    keep = row.indices != exclude
+    indices, values = row.indices[keep], row.data[keep]
+    if len(values) > count:
+        best = np.argpartition(-values, count)[:count]
+        indices, values = indices[best], values[best]
+    return indices, values
+
+
+def rebuild_similar_recipes(count=SIMILAR_RECIPES_COUNT,
+                            chunk=SIMILAR_RECIPES_CHUNK):
+    """Полностью пересчитывает таблицу похожих рецептов."""
+    recipe_ids, matrix = ingredient_matrix()
+    transposed = matrix.T.tocsr()
+    with transaction.atomic():
+        SimilarRecipe.objects.all().delete()
+        for start in range(0, matrix.shape[0], chunk):
+            block = (matrix[start:start + chunk] @ transposed).tocsr()
+            objects = []
+            for offset in range(block.shape[0]):
+                indices, values = top_neighbours(
+                    block[offset], start + offset, count)
+                objects.extend(
+                    SimilarRecipe(recipe_id=recipe_ids[start + offset],
+                                  similar_id=recipe_ids[index],
+                                  score=float(value))
+                    for index, value in zip(indices, values))
+            SimilarRecipe.objects.bulk_create(objects)
+    return len(recipe_ids)
+
+
+def refresh_similar_recipes(recipe_id, count=SIMILAR_RECIPES_COUNT):
+    """Обновляет соседей одного рецепта после изменения ингредиентов.
+
+    Сходство считается только с рецептами, у которых есть общие
+    ингредиенты. Рецепт добавляется в списки соседей, где он теперь
+    входит в топ, и удаляется из остальных. Списки соседей, из которых
+    рецепт выбыл, до следующего полного пересчета могут быть короче
+    count или содержать не самого сильного последнего соседа.
+    """
+    ingredient_ids = list(RecipeIngredient.objects.filter(
+        recipe_id=recipe_id).values_list('ingredient_id', flat=True))
+    overlaps = dict(RecipeIngredient.objects.filter(
+        ingredient_id__in=ingredient_ids).exclude(
+        recipe_id=recipe_id).order_by().values('recipe_id').annotate(
+        overlap=Count('id')).values_list('recipe_id', 'overlap'))
+    sizes = dict(Recipe.objects.filter(pk__in=overlaps).annotate(
+        size=Count('ingredient_recipe')).values_list('pk', 'size'))
+    candidate_ids = np.fromiter(overlaps, dtype=np.int64)
+    scores = np.fromiter(overlaps.values(), dtype=np.float64) / np.sqrt(
+        np.fromiter((sizes[pk] for pk in overlaps), dtype=np.float64)
+        * max(len(ingredient_ids), 1))
+    neighbours = SimilarRecipe.objects.filter(
+        recipe_id__in=overlaps).exclude(similar_id=recipe_id).order_by()
+    lowest = {
+        row['recipe_id']: (row['total'], row['lowest'])
+        for row in neighbours.values('recipe_id').annotate(
+            total=Count('id'), lowest=Min('score'))}
+    objects = [
+        SimilarRecipe(recipe_id=recipe_id, similar_id=int(candidate_ids[i]),
+                      score=float(scores[i]))
+        for i in np.argsort(-scores)[:count]]
+    trim = []
+    for pk, score in zip(candidate_ids.tolist(), scores.tolist()):
+        total, min_score = lowest.get(pk, (0, 0))
+        if total < count or score > min_score:
+            objects.append(SimilarRecipe(
+                recipe_id=pk, similar_id=recipe_id, score=score))
+            if total >= count:
+                trim.append(pk)
+    with transaction.atomic():
+        SimilarRecipe.objects.filter(
+            Q(recipe_id=recipe_id) | Q(similar_id=recipe_id)).delete()
+        SimilarRecipe.objects.bulk_create(objects)
+        for pk in trim:
+            SimilarRecipe.objects.filter(pk__in=SimilarRecipe.objects.filter(
+                recipe_id=pk).order_by('score').values('pk')[:1]).delete()
@@ -0,0 +1,80 @@
+import hashlib
+import os
+
+from django.apps import apps
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db.models import FileField
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище медиа, именующее файлы по хешу содержимого.
+
+    Одинаковые загрузки попадают в один и тот же файл, поэтому удалять
+    файл можно только после проверки ссылок через is_referenced().
+    """
+
+    def hashed_name(self, name, content):
+        digest = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        dir_name, file_name = os.path.split(name)
+        ext = os.path.splitext(file_name)[1].lower()
+        hexdigest = digest.hexdigest()
+        return os.path.join(dir_name, hexdigest[:2], hexdigest + ext)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.hashed_name(name, content)
+        if self.exists(name):
+            # Обновляем mtime, чтобы сборщик мусора не удалил файл,
+            # ссылка на который еще не сохранена в базе.
+            os.utime(self.path(name))
+            return name.replace('\\', '/')
+        return super().save(name, content, max_length)
+
+
+def media_fields():
+    """Возвращает пары (модель, поле) для всех файловых полей проекта."""
+    return [
+        (model, field.name)
+        for model in apps.get_models()
+        for field in model._meta.get_fields()
+        if isinstance(field, FileField)]
+
+
+def referenced(names):
+    """Возвращает подмножество имен, на которые ссылаются модели."""
+    names = set(names)
+    found = set()
+    for model, field in media_fields():
+        if not names - found:
+            break
+        found.update(model.objects.filter(
+            **{f'{field}__in': names - found}).values_list(field, flat=True))
+    return found
+
+
+def is_referenced(name):
+    return bool(referenced([name]))
+
+
+def is_orphan(name, deadline):
+    """Файл изменен раньше deadline, и на него не ссылается ни одна запись.
+
+    Повторная загрузка того же содержимого обновляет mtime файла еще до
+    сохранения ссылки в базе, поэтому недавно тронутый файл не удаляется,
+    даже если ссылки на него пока нет.
+    """
+    try:
+        mtime = os.path.getmtime(default_storage.path(name))
+    except FileNotFoundError:
+        return False
+    return mtime < deadline and not is_referenced(name)
@@ -0,0 +1,64 @@
+import os
+import time
+
+from django.core.files.storage import default_storage
+
+from .constants import MEDIA_DELETE_GRACE
+from .exports import export_path, write_csv
+from .jobs import task
+from .models import Recipe
+from .purge import purge_recipes, purge_user
+from .similarity import rebuild_similar_recipes, refresh_similar_recipes
+from .storage import is_orphan
+
+
+@task
+def delete_file(name):
+    """Удаляет файл из хранилища медиа, если на него больше нет ссылок.
+
+    Файл, тронутый повторной загрузкой за последние MEDIA_DELETE_GRACE
+    секунд, остается; если ссылка на него так и не появится,
+    его удалит gc_media.
+    """
+    if name and is_orphan(name, time.time() - MEDIA_DELETE_GRACE):
+        default_storage.delete(name)
+
+
+@task
+def delete_user(user_id):
+    """Удаляет пользователя вместе со всеми зависимыми объектами.
+
+    Удаление идет пачками; после сбоя повтор задачи продолжает его.
+    """
+    purge_user(user_id)
+
+
+@task
+def delete_recipes(recipe_ids):
+    """Удаляет рецепты вместе с зависимыми записями и картинками."""
+    purge_recipes(Recipe.objects.filter(pk__in=recipe_ids))
+
+
+@task
+def refresh_similar(recipe_id):
+    """Обновляет похожие рецепты после изменения ингредиентов."""
+    refresh_similar_recipes(recipe_id)
+
+
+@task
+def rebuild_similar():
+    """Полностью пересчитывает похожие рецепты после импорта."""
+    rebuild_similar_recipes()
+
+
+@task
+def export_csv(model, fields, name, ids=None, params=None, user_id=None):
+    """Пишет выгрузку из админки в CSV-файл."""
+    write_csv(model, fields, name, ids, params, user_id)
+
+
+@task
+def delete_export(name):
+    """Удаляет устаревший файл выгрузки."""
+    if os.path.exists(export_path(name)):
+        os.remove(export_path(name))
@@ -0,0 +1,286 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import Permission
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .constants import MEDIA_DELETE_GRACE
+from .jobs import beat, enqueue, requeue_stale, run_pending
+from .models import (Favorite, Job, Recipe, RecipeScore, ShoppingList,
+                     SimilarRecipe, Tag, User)
+from .popularity import refresh_popularity, refresh_scores
+from .tasks import delete_file
+from .transfer import import_recipes
+
+MEDIA_ROOT = tempfile.mkdtemp()
+EXPORTS_DIR = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class DeleteFileJobTests(TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def save_file(self, age):
+        name = default_storage.save('recipes/image.png',
+                                    ContentFile(b'image'))
+        mtime = time.time() - age
+        os.utime(default_storage.path(name), (mtime, mtime))
+        return name
+
+    def test_enqueue_and_run_delete_file(self):
+        name = self.save_file(age=2 * MEDIA_DELETE_GRACE)
+        with self.captureOnCommitCallbacks(execute=True):
+            enqueue('delete_file', name=name)
+        job = Job.objects.get()
+        self.assertEqual(job.name, 'delete_file')
+        self.assertEqual(job.payload, {'name': name})
+        self.assertEqual(run_pending(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
+        self.assertFalse(default_storage.exists(name))
+
+    def test_recently_touched_file_is_kept(self):
+        name = self.save_file(age=2 * MEDIA_DELETE_GRACE)
+        # Повторная загрузка того же содержимого обновляет mtime.
+        self.assertEqual(name, default_storage.save(
+            'recipes/image.png', ContentFile(b'image')))
+        delete_file(name)
+        self.assertTrue(default_storage.exists(name))
+        default_storage.delete(name)
+
+
+class StaleJobTests(TestCase):
+
+    def test_only_jobs_without_heartbeat_are_requeued(self):
+        alive = Job.objects.create(name='delete_file', status=Job.RUNNING)
+        stale = Job.objects.create(name='delete_file', status=Job.RUNNING)
+        Job.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+        beat(alive.pk)
+        self.assertEqual(requeue_stale(), 1)
+        alive.refresh_from_db()
+        stale.refresh_from_db()
+        self.assertEqual(alive.status, Job.RUNNING)
+        self.assertEqual(stale.status, Job.PENDING)
+
+
+class DeleteRecipesJobTests(TestCase):
+
+    def setUp(self):
+        author = User.objects.create_user(
+            username='author', email='author@foodgram.ru')
+        self.cook = User.objects.create_user(
+            username='cook', email='cook@foodgram.ru')
+        self.recipes = [
+            Recipe.objects.create(
+                author=author, name=f'Рецепт {number}', text='Текст',
+                cooking_time=5, image='recipes/image.png')
+            for number in range(3)]
+        for recipe in self.recipes:
+            Favorite.objects.create(user=self.cook, recipe=recipe)
+            ShoppingList.objects.create(user=self.cook, recipe=recipe)
+
+    def test_state_version_bumped_once_per_batch(self):
+        version = User.objects.get(pk=self.cook.pk).state_version
+        with self.captureOnCommitCallbacks(execute=True):
+            enqueue('delete_recipes',
+                    recipe_ids=[recipe.pk for recipe in self.recipes])
+        with self.captureOnCommitCallbacks(execute=True):
+            run_pending()
+        self.assertFalse(Recipe.objects.exists())
+        self.assertFalse(Favorite.objects.exists())
+        self.assertFalse(ShoppingList.objects.exists())
+        self.assertEqual(
+            User.objects.get(pk=self.cook.pk).state_version, version + 1)
+
+
+class AdminDeletionTests(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            username='admin', email='admin@foodgram.ru', password='secret')
+        self.cook = User.objects.create_user(
+            username='cook', email='cook@foodgram.ru')
+        self.recipe = Recipe.objects.create(
+            author=self.cook, name='Омлет', text='Текст', cooking_time=5,
+            image='recipes/image.png')
+        Favorite.objects.create(user=self.cook, recipe=self.recipe)
+
+    def delete_selected(self, model_name, pk):
+        return self.client.post(
+            reverse(f'admin:recipes_{model_name}_changelist'),
+            {'action': 'delete_selected', '_selected_action': [pk],
+             'post': 'yes'}, follow=True)
+
+    def test_recipe_deletion_is_reported_as_queued(self):
+        self.client.force_login(self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('admin:recipes_recipe_delete',
+                        args=(self.recipe.pk,)), {'post': 'yes'},
+                follow=True)
+        message = str(list(response.context['messages'])[0])
+        self.assertIn('поставлено в очередь', message)
+        self.assertTrue(Recipe.objects.filter(pk=self.recipe.pk).exists())
+        run_pending()
+        self.assertFalse(Recipe.objects.filter(pk=self.recipe.pk).exists())
+
+    def test_delete_selected_is_reported_as_queued(self):
+        self.client.force_login(self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.delete_selected('recipe', self.recipe.pk)
+        message = str(list(response.context['messages'])[0])
+        self.assertIn('Поставлено в очередь на удаление: 1', message)
+        self.assertTrue(Job.objects.filter(name='delete_recipes').exists())
+
+    def test_user_deletion_requires_delete_permission_on_dependents(self):
+        staff = User.objects.create_user(
+            username='staff', email='staff@foodgram.ru', is_staff=True)
+        staff.user_permissions.set(Permission.objects.filter(
+            codename__in=('view_user', 'delete_user')))
+        self.client.force_login(staff)
+        response = self.delete_selected('user', self.cook.pk)
+        self.assertEqual(response.status_code, 403)
+        self.assertTrue(User.objects.get(pk=self.cook.pk).is_active)
+        staff.user_permissions.add(*Permission.objects.filter(
+            codename__in=('delete_recipe', 'delete_favorite')))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.delete_selected('user', self.cook.pk)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(User.objects.get(pk=self.cook.pk).is_active)
+        self.assertTrue(Job.objects.filter(name='delete_user').exists())
+
+
+class PopularityTests(TestCase):
+
+    def setUp(self):
+        author = User.objects.create_user(
+            username='author', email='author@foodgram.ru')
+        self.recipes = [
+            Recipe.objects.create(
+                author=author, name=f'Рецепт {number}', text='Текст',
+                cooking_time=5, image='recipes/image.png')
+            for number in range(2)]
+        Favorite.objects.create(user=author, recipe=self.recipes[0])
+        RecipeScore.objects.create(
+            recipe=self.recipes[1], popular=3, trending=1)
+
+    def test_only_changed_scores_are_written(self):
+        refresh_popularity()
+        self.assertEqual(
+            list(RecipeScore.objects.values_list('recipe_id', 'popular')),
+            [(self.recipes[0].pk, 1.0)])
+        later = timezone.now() + timedelta(hours=1)
+        refresh_scores(later)
+        with self.assertNumQueries(3):
+            refresh_scores(later)
+
+
+class ImportRecipesTests(TestCase):
+
+    def record(self, name):
+        return json.dumps({
+            'name': name, 'text': 'Текст', 'cooking_time': 5,
+            'image': 'recipes/image.png',
+            'author': {'email': 'cook@foodgram.ru', 'username': 'cook',
+                       'first_name': 'Повар', 'last_name': 'Поваров'},
+            'tags': [{'name': 'Завтрак', 'slug': 'breakfast'}],
+            'ingredients': [
+                {'name': 'Соль', 'measurement_unit': 'г', 'amount': 5}],
+        }, ensure_ascii=False)
+
+    def test_import_enqueues_similarity_rebuild(self):
+        file = io.StringIO('\n'.join(
+            self.record(name) for name in ('Омлет', 'Яичница')))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(import_recipes(file), (2, 0, {}))
+        job = Job.objects.get(name='rebuild_similar')
+        self.assertEqual(job.key, 'rebuild_similar')
+        self.assertEqual(run_pending(), 1)
+        self.assertEqual(SimilarRecipe.objects.count(), 2)
+
+    def test_reimport_skips_existing_recipes(self):
+        lines = [self.record(name) for name in ('Омлет', 'Омлет', 'Каша')]
+        self.assertEqual(import_recipes(io.StringIO('\n'.join(lines[:2]))),
+                         (1, 1, {}))
+        self.assertEqual(import_recipes(io.StringIO('\n'.join(lines)),
+                                        batch_size=1), (1, 2, {}))
+        self.assertEqual(Recipe.objects.count(), 2)
+
+    def test_tag_with_taken_name_is_mapped_to_existing_tag(self):
+        tag = Tag.objects.create(name='Завтрак', slug='morning')
+        self.assertEqual(import_recipes(io.StringIO(self.record('Омлет'))),
+                         (1, 0, {'breakfast': 'morning'}))
+        self.assertEqual(list(Recipe.objects.get().tags.all()), [tag])
+
+
+@override_settings(EXPORTS_DIR=EXPORTS_DIR)
+class AdminExportTests(TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(EXPORTS_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@foodgram.ru', password='secret')
+        self.recipes = [
+            Recipe.objects.create(
+                author=admin, name=name, text='Текст', cooking_time=5,
+                image='recipes/image.png')
+            for name in ('Омлет', 'Каша')]
+        self.client.force_login(admin)
+
+    def download(self, name):
+        return self.client.get(
+            reverse('admin:recipes_recipe_export_download', args=(name,)),
+            follow=True)
+
+    def content(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    def test_export_is_written_by_job(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('admin:recipes_recipe_export') + '?q=Омлет')
+        self.assertEqual(response.status_code, 302)
+        payload = Job.objects.get(name='export_csv').payload
+        self.assertEqual(payload['params'], {'q': ['Омлет']})
+        self.assertNotIn('query', payload)
+        message = str(list(self.download(payload['name']).context[
+            'messages'])[-1])
+        self.assertIn('еще готовится', message)
+        self.assertEqual(run_pending(), 1)
+        content = self.content(self.download(payload['name']))
+        self.assertIn('Омлет,admin@foodgram.ru', content)
+        self.assertNotIn('Каша', content)
+
+    def test_export_is_not_started_by_get(self):
+        response = self.client.get(reverse('admin:recipes_recipe_export'))
+        self.assertEqual(response.status_code, 405)
+        self.assertFalse(Job.objects.exists())
+
+    def test_action_exports_selected_records(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('admin:recipes_recipe_changelist'), {
+                'action': 'export_csv',
+                '_selected_action': [self.recipes[1].pk]})
+        payload = Job.objects.get(name='export_csv').payload
+        self.assertEqual(payload['ids'], [self.recipes[1].pk])
+        run_pending()
+        content = self.content(self.download(payload['name']))
+        self.assertIn('Каша', content)
+        self.assertNotIn('Омлет', content)
@@ -0,0 +1,213 @@
+import json
+from collections import defaultdict
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.dispatch import Signal
+
+from .constants import TRANSFER_BATCH_SIZE
+from .ingredient_index import notify_changed
+from .jobs import enqueue
+from .models import Ingredient, Recipe, RecipeIngredient, Tag, User
+
+AUTHOR_FIELDS = ('email', 'username', 'first_name', 'last_name')
+
+recipes_imported = Signal()
+
+
+def export_recipes(file, batch_size=TRANSFER_BATCH_SIZE):
+    """Пишет рецепты в файл построчно в формате JSONL.
+
+    Рецепты читаются пачками по возрастанию id, теги и ингредиенты
+    догружаются для каждой пачки, поэтому память не растет с размером
+    таблицы. Картинки выгружаются ссылками на файлы в хранилище.
+    """
+    total = 0
+    last_pk = 0
+    while True:
+        recipes = list(
+            Recipe.objects.filter(pk__gt=last_pk).order_by('pk').values(
+                'pk', 'name', 'text', 'cooking_time', 'image',
+                *(f'author__{field}' for field in AUTHOR_FIELDS))
+            [:batch_size])
+        if not recipes:
+            return total
+        pks = [recipe['pk'] for recipe in recipes]
+        tags = defaultdict(list)
+        for recipe_id, name, slug in Recipe.tags.through.objects.filter(
+                recipe_id__in=pks).order_by('pk').values_list(
+                    'recipe_id', 'tag__name', 'tag__slug'):
+            tags[recipe_id].append({'name': name, 'slug': slug})
+        ingredients = defaultdict(list)
+        for recipe_id, name, unit, amount in RecipeIngredient.objects.filter(
+                recipe_id__in=pks).order_by('pk').values_list(
+                    'recipe_id', 'ingredient__name',
+                    'ingredient__measurement_unit', 'amount'):
+            ingredients[recipe_id].append(
+                {'name': name, 'measurement_unit': unit, 'amount': amount})
+        for recipe in recipes:
+            record = {
+                'name': recipe['name'],
+                'text': recipe['text'],
+                'cooking_time': recipe['cooking_time'],
+                'image': recipe['image'],
+                'author': {field: recipe[f'author__{field}']
+                           for field in AUTHOR_FIELDS},
+                'tags': tags[recipe['pk']],
+                'ingredients': ingredients[recipe['pk']],
+            }
+            file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        total += len(recipes)
+        last_pk = pks[-1]
+
+
+def resolve_authors(records):
+    """id авторов по email; недостающие создаются без пароля."""
+    authors = {record['author']['email']: record['author']
+               for record in records}
+    User.objects.bulk_create(
+        [User(password=make_password(None),
+              **{field: author[field] for field in AUTHOR_FIELDS})
+         for author in authors.values()],
+        ignore_conflicts=True)
+    return dict(User.objects.filter(email__in=authors).values_list(
+        'email', 'pk'))
+
+
+def resolve_tags(records):
+    """id тегов по slug; недостающие теги создаются.
+
+    Тег, название которого уже занято тегом с другим slug, сопоставляется
+    с существующим тегом. Возвращает id тегов по slug из файла и словарь
+    таких сопоставлений: slug из файла — slug существующего тега.
+    """
+    tags = {tag['slug']: tag['name']
+            for record in records for tag in record['tags']}
+    Tag.objects.bulk_create(
+        [Tag(name=name, slug=slug) for slug, name in tags.items()],
+        ignore_conflicts=True)
+    ids = dict(Tag.objects.filter(slug__in=tags).values_list('slug', 'pk'))
+    names = {tags[slug]: slug for slug in tags if slug not in ids}
+    renamed = {}
+    for pk, name, existing_slug in Tag.objects.filter(
+            name__in=names).values_list('pk', 'name', 'slug'):
+        ids[names[name]] = pk
+        renamed[names[name]] = existing_slug
+    return ids, renamed
+
+
+def resolve_ingredients(records):
+    """id ингредиентов по паре (название, единица измерения).
+
+    Недостающие ингредиенты создаются, уже существующие пропускаются
+    по ограничению уникальности unique_name_measurement_unit.
+    """
+    keys = {(ingredient['name'], ingredient['measurement_unit'])
+            for record in records for ingredient in record['ingredients']}
+    Ingredient.objects.bulk_create(
+        [Ingredient(name=name, measurement_unit=unit) for name, unit in keys],
+        ignore_conflicts=True)
+    return {
+        (name, unit): pk
+        for pk, name, unit in Ingredient.objects.filter(
+            name__in={name for name, _ in keys}).values_list(
+                'pk', 'name', 'measurement_unit')
+        if (name, unit) in keys}
+
+
+def create_recipes(recipes):
+    if connection.features.can_return_rows_from_bulk_insert:
+        return Recipe.objects.bulk_create(recipes)
+    # SQLite в Django 3.2 не возвращает id из bulk_create.
+    for recipe in recipes:
+        recipe.save()
+    return recipes
+
+
+def existing_recipes(records, authors):
+    """Пары (id автора, название) уже загруженных рецептов пачки."""
+    return set(Recipe.objects.filter(
+        author_id__in={authors[record['author']['email']]
+                       for record in records},
+        name__in={record['name'] for record in records}).values_list(
+            'author_id', 'name'))
+
+
+def import_batch(records):
+    """Создает рецепты пачки в одной транзакции.
+
+    Рецепт определяется автором и названием, поэтому повторный импорт
+    не создает дубликаты: рецепт, который у автора уже есть или уже
+    встретился в файле, пропускается. Пропускаются и рецепты автора,
+    username которого занят пользователем с другим email. Возвращает
+    число созданных и пропущенных рецептов и сопоставленные теги.
+    """
+    with transaction.atomic():
+        authors = resolve_authors(records)
+        tags, renamed_tags = resolve_tags(records)
+        ingredients = resolve_ingredients(records)
+        total = len(records)
+        records = [record for record in records
+                   if record['author']['email'] in authors]
+        seen = existing_recipes(records, authors)
+        new_records = []
+        for record in records:
+            key = (authors[record['author']['email']], record['name'])
+            if key not in seen:
+                seen.add(key)
+                new_records.append(record)
+        records = new_records
+        recipes = create_recipes([
+            Recipe(author_id=authors[record['author']['email']],
+                   name=record['name'], text=record['text'],
+                   cooking_time=record['cooking_time'],
+                   image=record['image'])
+            for record in records])
+        RecipeIngredient.objects.bulk_create([
+            RecipeIngredient(
+                recipe=recipe, amount=ingredient['amount'],
+                ingredient_id=ingredients[
+                    ingredient['name'], ingredient['measurement_unit']])
+            for recipe, record in zip(recipes, records)
+            for ingredient in record['ingredients']])
+        Recipe.tags.through.objects.bulk_create([
+            Recipe.tags.through(recipe=recipe, tag_id=tags[tag['slug']])
+            for recipe, record in zip(recipes, records)
+            for tag in record['tags'] if tag['slug'] in tags],
+            ignore_conflicts=True)
+    return len(recipes), total - len(recipes), renamed_tags
+
+
+def import_recipes(file, batch_size=TRANSFER_BATCH_SIZE, progress=None):
+    """Загружает рецепты из JSONL-файла пачками по batch_size строк.
+
+    Возвращает число созданных и пропущенных рецептов и словарь тегов,
+    сопоставленных с существующими по названию (см. resolve_tags).
+    Каждая пачка создается отдельной транзакцией через bulk_create,
+    поэтому при ошибке уже загруженные пачки сохраняются. bulk_create
+    не вызывает сигналы рецептов, поэтому после загрузки похожие рецепты
+    пересчитываются задачей rebuild_similar, а версия индекса ингредиентов
+    и кеши ответов сбрасываются через кеш Django. Воркеры API видят этот
+    сброс, только если кеш общий (MEMCACHED_LOCATION).
+    """
+    created = skipped = 0
+    renamed_tags = {}
+    lines = (line for line in file if line.strip())
+    try:
+        while True:
+            records = [json.loads(line) for line in islice(lines, batch_size)]
+            if not records:
+                return created, skipped, renamed_tags
+            batch_created, batch_skipped, batch_renamed = import_batch(
+                records)
+            created += batch_created
+            skipped += batch_skipped
+            renamed_tags.update(batch_renamed)
+            if progress:
+                progress(created, skipped)
+    finally:
+        if created:
+            enqueue('rebuild_similar', key='rebuild_similar')
+            notify_changed()
+            recipes_imported.send(sender=Recipe)